@@ -3,11 +3,12 @@
 # Starts the Prover Service on OCI CVM.
 #
 # This script changes to the application directory and launches the
-# FastAPI prover service using uvicorn.
+# FastAPI prover service using uvicorn, one warmed prover per worker.
 #
 # Usage:
-#   ./start_prover.sh
+#   PROVER_WORKERS=4 ./start_prover.sh   # default: half the cores, at least 1
 #
 set -euo pipefail
 cd /opt/zk-autograd
-uvicorn prover.service:app --host 0.0.0.0 --port 8000
+WORKERS=${PROVER_WORKERS:-$(( $(nproc) / 2 > 0 ? $(nproc) / 2 : 1 ))}
+uvicorn prover.service:app --host 0.0.0.0 --port 8000 --workers "$WORKERS"
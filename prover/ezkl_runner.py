@@ -14,10 +14,59 @@ Artifacts expected in key_dir:
 Setup:
   zk-setup-zk --circuit adam --out prover/keys
 """
-import os, json, tempfile
+import os, json, mmap, errno, shutil, hashlib, tempfile, threading, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import numpy as np
 import ezkl
-from zk_autograd.splitting import aggregate_proofs
+from zk_autograd.splitting import aggregate_proofs, ezkl_aggregation_available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Per-request scratch (input, witness, proof) lives on tmpfs when available so
+# it never touches a physical disk; release() deletes it after the response.
+# /dev/shm is only 64 MB in a default Docker container, so a request falls
+# back to the regular temp dir when tmpfs is short of space (or fills up).
+SCRATCH_ROOT = os.environ.get("EZKL_SCRATCH", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+SCRATCH_MIN_FREE = int(os.environ.get("EZKL_SCRATCH_MIN_FREE", str(256 << 20)))
+
+def _scratch_dir() -> str:
+    """Creates one request's scratch directory, off tmpfs if tmpfs is nearly full."""
+    root = SCRATCH_ROOT
+    try:
+        st = os.statvfs(root)
+        if st.f_bavail * st.f_frsize < SCRATCH_MIN_FREE:
+            root = tempfile.gettempdir()
+    except (AttributeError, OSError):
+        pass
+    return tempfile.mkdtemp(prefix="ezkl_step_", dir=root)
+
+# Per-process prover used by chunk-proving pool workers.
+_WORKER_PROVER = None
+
+def _init_worker(key_dir: str, circuit: str, witness_cache):
+    """Builds a lightweight prover once per pool worker process.
+
+    The worker only needs the artifact paths: the parent already maps the
+    artifacts and sweeps the witness cache, so workers skip both.
+    """
+    global _WORKER_PROVER
+    _WORKER_PROVER = EzklProver(key_dir=key_dir, circuit=circuit, workers=1,
+                                witness_cache=witness_cache or "", worker=True)
+
+def _prove_one_chunk(payload: dict) -> str:
+    """Proves a single chunk inside a pool worker and returns the proof path."""
+    pf, _ = _WORKER_PROVER.prove_step(payload)
+    return pf
+
+def _aggregate_pair(job) -> str:
+    """Aggregates one node of the reduction tree; a lone proof passes through."""
+    pair, out_path = job
+    if len(pair) == 1:
+        return pair[0]
+    return aggregate_proofs(list(pair), out_path)
 
 class EzklProver:
     """Manages the EZKL proving process for ZK-Autograd.
@@ -34,32 +83,167 @@ class EzklProver:
         pk: Path to the proving key.
         vk: Path to the verification key.
         srs: Path to the Structured Reference String (SRS).
+        workers: Maximum number of processes used to prove chunks in parallel.
+        witness_cache: Directory of cached witnesses keyed by input hash, or
+            None when caching is disabled.
     """
 
-    def __init__(self, key_dir="prover/keys", circuit="adam"):
+    def __init__(self, key_dir="prover/keys", circuit="adam", workers=None,
+                 witness_cache=None, worker=False):
         """Initializes the EzklProver.
 
         Args:
             key_dir: The directory containing the EZKL artifacts.
             circuit: The name of the circuit to use.
+            workers: Maximum number of chunk-proving processes. Defaults to
+                `EZKL_PROVE_WORKERS` or the CPU count.
+            witness_cache: Witness cache directory. Defaults to
+                `EZKL_WITNESS_CACHE` or `<key_dir>/witness_cache`; an empty
+                string disables the cache.
+            worker: Set in chunk-proving pool workers, which skip artifact
+                mapping and the witness cache sweep (the parent does both).
         """
         self.key_dir = key_dir
         self.circuit = circuit
+        self.workers = int(workers or os.getenv("EZKL_PROVE_WORKERS", os.cpu_count() or 1))
+        self._pool = None
+        self._mmaps = {}
+        self._circuit_stats = self._circuit_hash = None
+        self.warm = False
+        self._warm_lock = threading.Lock()
         self.settings = os.path.join(key_dir, "settings.json")
         self.compiled = os.path.join(key_dir, "compiled.ezkl")
         self.pk = os.path.join(key_dir, "pk.key")
         self.vk = os.path.join(key_dir, "vk.key")
         self.srs = os.path.join(key_dir, "kzg.srs")
+        if witness_cache is None:
+            witness_cache = os.getenv("EZKL_WITNESS_CACHE", os.path.join(key_dir, "witness_cache"))
+        self.witness_cache = witness_cache or None
         self._sanity()
+        if worker:
+            return
+        self._warm_artifacts()
+        if self.witness_cache:
+            Path(self.witness_cache).mkdir(parents=True, exist_ok=True)
+            self._sweep_witness_cache(int(os.getenv("EZKL_WITNESS_CACHE_MAX", "256")))
 
     def _sanity(self):
         for p in [self.settings, self.compiled, self.pk, self.vk, self.srs]:
             if not os.path.exists(p):
                 raise FileNotFoundError(f"Missing EZKL artifact: {p}. Run zk-setup-zk first.")
 
+    def _warm_artifacts(self):
+        """Maps the large artifacts read-only so they stay in the page cache.
+
+        The EZKL bindings only accept paths, so the mappings are not passed to
+        EZKL; holding them keeps every later load of pk/srs/compiled a memory
+        read instead of a disk read.
+        """
+        for name, p in (("pk", self.pk), ("srs", self.srs), ("compiled", self.compiled)):
+            with open(p, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    continue
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+                self._mmaps[name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _circuit_id(self) -> str:
+        """Content hash of the circuit: compiled model, settings and vk.
+
+        Rehashed only when one of the files' stat identity changes, so a
+        regenerated circuit never matches witnesses cached for the old one.
+        """
+        stats = tuple((st.st_ino, st.st_size, st.st_mtime_ns)
+                      for st in map(os.stat, (self.compiled, self.settings, self.vk)))
+        if self._circuit_stats != stats:
+            h = hashlib.sha256()
+            for p in (self.compiled, self.settings, self.vk):
+                with open(p, "rb") as f:
+                    h.update(hashlib.file_digest(f, "sha256").digest() if hasattr(hashlib, "file_digest")
+                             else hashlib.sha256(f.read()).digest())
+            self._circuit_stats, self._circuit_hash = stats, h.hexdigest()
+        return self._circuit_hash
+
+    def _witness_key(self, input_path: str) -> str:
+        """Content hash of a witness: the input bytes plus the circuit identity."""
+        h = hashlib.sha256(f"{self._circuit_id()}:".encode())
+        with open(input_path, "rb") as f:
+            h.update(f.read())
+        return h.hexdigest()
+
+    def _sweep_witness_cache(self, max_entries: int):
+        """Drops the least recently used witnesses beyond `max_entries`.
+
+        Several processes may sweep the same directory at once, so entries
+        that vanish mid-sweep are skipped rather than treated as errors.
+        """
+        entries = []
+        for e in os.scandir(self.witness_cache):
+            if not e.name.endswith(".wit"):
+                continue
+            try:
+                entries.append((e.stat().st_mtime_ns, e.path))
+            except FileNotFoundError:
+                pass
+        entries.sort(reverse=True)
+        for _, path in entries[max_entries:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _gen_witness(self, input_path: str, witness_path: str) -> str:
+        """Generates the witness for `input_path`, reusing a cached one if present.
+
+        Returns:
+            The path of the witness to prove with.
+        """
+        if not self.witness_cache:
+            ezkl.gen_witness(data=input_path, model=self.compiled, output=witness_path,
+                             vk_path=self.vk, srs_path=self.srs)
+            return witness_path
+        cached = os.path.join(self.witness_cache, self._witness_key(input_path) + ".wit")
+        if os.path.exists(cached):
+            os.utime(cached)
+            return cached
+        ezkl.gen_witness(data=input_path, model=self.compiled, output=witness_path,
+                         vk_path=self.vk, srs_path=self.srs)
+        staging = f"{cached}.{os.getpid()}.tmp"
+        shutil.copyfile(witness_path, staging)
+        os.replace(staging, cached)
+        return witness_path
+
+    def _executor(self) -> ProcessPoolExecutor:
+        """Returns the chunk-proving process pool, creating it on first use.
+
+        Workers are spawned, not forked: the pool is created lazily from a
+        threadpool thread in a process that already runs other threads and
+        EZKL's own thread pool, and forking such a process can deadlock the
+        child on a lock held by a thread that no longer exists.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.key_dir, self.circuit, self.witness_cache))
+        return self._pool
+
+    def close(self):
+        """Shuts down the chunk-proving pool and releases artifact mappings."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for mm in self._mmaps.values():
+            mm.close()
+        self._mmaps.clear()
+
     def _write_input_json(self, payload: dict, path: str):
         """Writes the input payload to a JSON file formatted for EZKL.
 
+        The flat vectors may be lists or int64 arrays. With `orjson` installed
+        arrays are serialized directly, without boxing each element.
+
         Args:
             payload: The input data dictionary containing weights, gradients, etc.
             path: The output path for the JSON file.
@@ -75,33 +259,22 @@ class EzklProver:
             [payload.get("eps", 1e-8)],
             [float(payload.get("t", 1))]
         ]
+        if orjson is not None:
+            with open(path, "wb") as f:
+                f.write(orjson.dumps({"input_data": input_data}, option=orjson.OPT_SERIALIZE_NUMPY))
+            return
+        input_data = [x.tolist() if isinstance(x, np.ndarray) else x for x in input_data]
         with open(path, "w", encoding="utf-8") as f:
             json.dump({"input_data": input_data}, f)
 
-    def prove_step(self, payload: dict):
-        """Generates a ZK proof for a single optimization step.
-
-        Args:
-            payload: The input data for the step.
-
-        Returns:
-            A tuple containing the path to the generated proof file and the
-            public inputs dictionary.
-        """
-        tmp = tempfile.mkdtemp(prefix="ezkl_step_")
+    def _prove_in(self, tmp: str, payload: dict) -> str:
+        """Writes the input, witness and proof for `payload` under `tmp`; returns the proof path."""
         input_path = os.path.join(tmp, "input.json")
         witness_path = os.path.join(tmp, "witness.json")
         proof_path = os.path.join(tmp, "proof.pf")
 
         self._write_input_json(payload, input_path)
-
-        ezkl.gen_witness(
-            data=input_path,
-            model=self.compiled,
-            output=witness_path,
-            vk_path=self.vk,
-            srs_path=self.srs
-        )
+        witness_path = self._gen_witness(input_path, witness_path)
 
         ezkl.prove(
             witness=witness_path,
@@ -110,6 +283,35 @@ class EzklProver:
             proof_path=proof_path,
             srs_path=self.srs
         )
+        return proof_path
+
+    def prove_step(self, payload: dict):
+        """Generates a ZK proof for a single optimization step.
+
+        Witnesses are deterministic in the circuit inputs, so a repeated input
+        (retries, replays) reuses the cached witness and skips generation.
+
+        Args:
+            payload: The input data for the step.
+
+        Returns:
+            A tuple containing the path to the generated proof file and the
+            public inputs dictionary.
+        """
+        tmp = _scratch_dir()
+        try:
+            try:
+                proof_path = self._prove_in(tmp, payload)
+            except OSError as e:
+                if e.errno != errno.ENOSPC or tmp.startswith(tempfile.gettempdir() + os.sep):
+                    raise
+                # tmpfs filled up between the space check and the writes.
+                shutil.rmtree(tmp, ignore_errors=True)
+                tmp = tempfile.mkdtemp(prefix="ezkl_step_", dir=tempfile.gettempdir())
+                proof_path = self._prove_in(tmp, payload)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
 
         public_inputs = {
             "circuit": self.circuit,
@@ -120,9 +322,45 @@ class EzklProver:
         }
         return proof_path, public_inputs
 
+    def _circuit_dim(self):
+        """Vector length the circuit was built for, from the `zk-setup-zk` manifest."""
+        try:
+            with open(os.path.join(self.key_dir, "manifest.json"), encoding="utf-8") as f:
+                return int(json.load(f)["dim"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def warmup(self, dim: int = None):
+        """Runs one throwaway proof so EZKL loads the circuit and keys up front.
+
+        Safe to call repeatedly and from several threads; only the first
+        successful call does any work, and concurrent callers wait for it.
+
+        Args:
+            dim: Length of the zero vectors in the canned payload. Defaults to
+                `EZKL_WARMUP_DIM`, else the dim recorded by `zk-setup-zk` in
+                the key dir's manifest, else 128 (the `zk-setup-zk` default).
+        """
+        with self._warm_lock:
+            if self.warm:
+                return
+            dim = int(dim or os.getenv("EZKL_WARMUP_DIM") or self._circuit_dim() or 128)
+            zeros = [0] * dim
+            pf, _ = self.prove_step({
+                "w_flat": zeros, "g_flat": zeros, "m_flat": zeros, "v_flat": zeros,
+                "lr": 0.0, "t": 1, "step_idx": -1,
+            })
+            shutil.rmtree(os.path.dirname(pf), ignore_errors=True)
+            self.warm = True
+
     def prove_step_chunks(self, payload: dict, chunks: int = 1):
         """Generates proofs for a step, optionally splitting it into chunks.
 
+        Chunks are independent, so they are proved concurrently on the process
+        pool (up to `workers` at a time). Proof paths keep chunk order. If any
+        chunk fails, the scratch directories of the chunks that were proved
+        are released before the error is re-raised.
+
         Args:
             payload: The input data for the step.
             chunks: The number of chunks to split the proof into.
@@ -134,25 +372,69 @@ class EzklProver:
             pf, pubs = self.prove_step(payload)
             return [pf], pubs
 
-        total = len(payload["w_flat"])
+        flats = {k: np.asarray(payload[k], dtype=np.int64) for k in ["w_flat","g_flat","m_flat","v_flat"]}
+        total = len(flats["w_flat"])
         block = (total + chunks - 1) // chunks
-        proof_paths = []
+        chunk_payloads = []
         for i in range(chunks):
             p2 = dict(payload)
             sl = slice(i*block, min((i+1)*block, total))
-            for k in ["w_flat","g_flat","m_flat","v_flat"]:
-                p2[k] = p2[k][sl]
+            for k, arr in flats.items():
+                p2[k] = arr[sl]
             p2["chunk_idx"] = i
             p2["chunks"] = chunks
-            pf, _ = self.prove_step(p2)
-            proof_paths.append(pf)
+            chunk_payloads.append(p2)
+
+        proof_paths, error = [], None
+        if min(chunks, self.workers) <= 1:
+            try:
+                for p2 in chunk_payloads:
+                    proof_paths.append(self.prove_step(p2)[0])
+            except BaseException as e:
+                error = e
+        else:
+            # Not `map`: it would drop the successful chunks' paths on error.
+            futures = [self._executor().submit(_prove_one_chunk, p2) for p2 in chunk_payloads]
+            for fut in futures:
+                try:
+                    proof_paths.append(fut.result())
+                except BaseException as e:
+                    error = error or e
+        if error is not None:
+            self.release(proof_paths)
+            raise error
 
         base_public = {"circuit": self.circuit, "step_idx": payload["step_idx"], "lr": payload["lr"], "chunks": chunks}
         return proof_paths, base_public
 
+    def release(self, proof_paths):
+        """Deletes the scratch directories that hold the given proofs.
+
+        Only directories created by `prove_step` are removed.
+
+        Args:
+            proof_paths: Proof paths returned by `prove_step_chunks`.
+        """
+        for p in proof_paths:
+            d = os.path.dirname(p)
+            if os.path.basename(d).startswith("ezkl_step_"):
+                shutil.rmtree(d, ignore_errors=True)
+
     def aggregate_chunk_proofs(self, proof_paths, out_path):
         """Aggregates multiple partial proofs into a single proof.
 
+        With EZKL available, all chunk proofs are aggregated in one call
+        against the step circuit's vk: re-aggregating aggregation proofs
+        would need the aggregation circuit's own vk/settings, so there is no
+        tree on this path.
+
+        The hash fallback is instead reduced pairwise as a binary tree, each
+        level's pairs in parallel on the process pool, so k chunks take about
+        log2(k) rounds. Inner nodes hash the child nodes' hex digests, so the
+        result commits to the chunk proofs in order but is not the flat
+        Merkle root that one `aggregate_proofs` call over them would give.
+        Intermediate files are written next to `out_path`.
+
         Args:
             proof_paths: List of paths to the partial proofs.
             out_path: Path to save the aggregated proof.
@@ -160,7 +442,17 @@ class EzklProver:
         Returns:
             The path to the aggregated proof.
         """
-        return aggregate_proofs(proof_paths, out_path)
+        if ezkl_aggregation_available(self.vk, self.srs):
+            return aggregate_proofs(list(proof_paths), out_path, vk_path=self.vk, srs_path=self.srs)
+        out_dir = os.path.dirname(out_path)
+        mapper = self._executor().map if self.workers > 1 else map
+        level, depth = list(proof_paths), 0
+        while len(level) > 2:
+            jobs = [(level[j:j+2], os.path.join(out_dir, f"agg_{depth}_{j//2}.pf"))
+                    for j in range(0, len(level), 2)]
+            level = list(mapper(_aggregate_pair, jobs))
+            depth += 1
+        return aggregate_proofs(level, out_path)
 
 def verify_proof(proof_path: str, settings_path: str, vk_path: str, srs_path: str) -> bool:
     """Verifies a ZK proof using EZKL.
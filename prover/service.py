@@ -1,18 +1,36 @@
-import os, hashlib
-from fastapi import FastAPI
-from pydantic import BaseModel
+import os, json, mmap, hashlib, logging
+from contextlib import asynccontextmanager
+import anyio.to_thread
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from starlette.background import BackgroundTask
+from starlette.responses import FileResponse, Response
 from prover.ezkl_runner import EzklProver
+from zk_autograd.prover_client import STEP_META_HEADER, decode_step
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
 
-app = FastAPI(title="zk-Autograd Prover (EZKL, PoC)")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Builds and warms this worker's prover on startup; frees it on shutdown.
 
-class StepPayload(BaseModel):
-    """Data model for the proof request payload.
+    Each uvicorn worker process runs its own lifespan, so every worker gets
+    its own warmed EzklProver.
+    """
+    _startup()
+    yield
+    if PROVER is not None:
+        PROVER.close()
+
+app = FastAPI(title="zk-Autograd Prover (EZKL, PoC)", lifespan=lifespan)
+log = logging.getLogger(__name__)
+
+class StepMeta(BaseModel):
+    """Scalar fields of a proof request.
 
     Attributes:
-        w_flat: Flattened weight tensor.
-        g_flat: Flattened gradient tensor.
-        m_flat: Flattened first moment tensor (Adam).
-        v_flat: Flattened second moment tensor (Adam).
         lr: Learning rate.
         beta1: Adam beta1 parameter.
         beta2: Adam beta2 parameter.
@@ -23,10 +41,6 @@ class StepPayload(BaseModel):
         scale: Fixed-point scaling factor.
         circuit: Name of the circuit to use.
     """
-    w_flat: list[int]
-    g_flat: list[int]
-    m_flat: list[int]
-    v_flat: list[int]
     lr: float
     beta1: float
     beta2: float
@@ -37,40 +51,160 @@ class StepPayload(BaseModel):
     scale: int = 1000
     circuit: str = "adam"
 
+class StepPayload(StepMeta):
+    """Data model for the JSON proof request payload.
+
+    Attributes:
+        w_flat: Flattened weight tensor.
+        g_flat: Flattened gradient tensor.
+        m_flat: Flattened first moment tensor (Adam).
+        v_flat: Flattened second moment tensor (Adam).
+    """
+    w_flat: list[int]
+    g_flat: list[int]
+    m_flat: list[int]
+    v_flat: list[int]
+
 PROVER: EzklProver | None = None
 
-@app.on_event("startup")
 def _startup():
     global PROVER
+    # /prove_step is a sync endpoint, so it runs on anyio's threadpool. Proofs
+    # are CPU-bound, so bound concurrent proofs per process via PROVE_THREADS.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = int(os.getenv("PROVE_THREADS", "16"))
+    if PROVER is not None:
+        return
     key_dir = os.getenv("EZKL_KEY_DIR", "prover/keys")
     PROVER = EzklProver(key_dir=key_dir, circuit=os.getenv("EZKL_CIRCUIT","adam"))
+    if os.getenv("EZKL_WARMUP", "1") == "1":
+        _try_warmup()
+
+def _try_warmup():
+    """Warms the prover; a failed warm-up is logged, and proving is still attempted on demand."""
+    try:
+        PROVER.warmup()
+    except Exception:
+        log.exception("prover warm-up failed; continuing cold")
+
+@app.get("/warmup")
+def warmup():
+    """Readiness endpoint: warms the prover if needed and reports its state.
+
+    Concurrent probes share one warm-up (see `EzklProver.warmup`).
+
+    Returns:
+        A dictionary with `warm` set once the prover has completed a proof.
+    """
+    assert PROVER is not None
+    _try_warmup()
+    return {"warm": bool(PROVER.warm)}
+
+def _file_sha256(path: str) -> str:
+    """Hashes a file in one pass over a read-only mmap of it.
+
+    The page cache is hashed in place, with no copies into Python buffers;
+    the file itself is then sent by `FileResponse` via sendfile.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.sha256(mm).hexdigest()
+
+def _accepts_zstd(request: Request) -> bool:
+    """Whether the client listed zstd in `Accept-Encoding` and we can produce it."""
+    if zstd is None:
+        return False
+    accepted = request.headers.get("accept-encoding", "")
+    return any(enc.split(";")[0].strip() == "zstd" for enc in accepted.split(","))
+
+def _prove(payload: dict, request: Request):
+    """Proves one step and builds the proof response (see `prove_step`)."""
+    assert PROVER is not None
+    chunks = int(os.getenv("EZKL_CHUNKS","1"))
+    proof_paths, public_inputs = PROVER.prove_step_chunks(payload, chunks=chunks)
+    try:
+        if len(proof_paths) > 1:
+            agg_path = os.path.join(os.path.dirname(proof_paths[0]), "aggregated.pf")
+            proof_path = PROVER.aggregate_chunk_proofs(proof_paths, agg_path)
+        else:
+            proof_path = proof_paths[0]
+
+        headers = {
+            "X-Proof-Hash": _file_sha256(proof_path),
+            "X-Step-Idx": str(payload["step_idx"]),
+            "X-Chunks": str(chunks),
+            "X-Public-Inputs": json.dumps(public_inputs),
+        }
+        cleanup = BackgroundTask(PROVER.release, proof_paths)
+        if _accepts_zstd(request):
+            with open(proof_path, "rb") as f:
+                body = zstd.ZstdCompressor(level=3).compress(f.read())
+            headers["Content-Encoding"] = "zstd"
+            return Response(body, media_type="application/octet-stream", headers=headers, background=cleanup)
+        return FileResponse(proof_path, media_type="application/octet-stream", headers=headers, background=cleanup)
+    except BaseException:
+        # No response will run the cleanup task, so release the scratch now.
+        PROVER.release(proof_paths)
+        raise
 
 @app.post("/prove_step")
-def prove_step(payload: StepPayload):
+def prove_step(payload: StepPayload, request: Request):
     """Endpoint to generate a ZK proof for a training step.
 
+    Declared as a plain `def` on purpose: the EZKL calls are blocking, and
+    Starlette dispatches sync endpoints to the threadpool instead of the
+    event loop.
+
     Args:
         payload: The step data containing weights, gradients, etc.
 
     Returns:
-        A dictionary containing the proof bytes, public inputs, proof hash,
-        step index, and chunking information.
+        The proof file streamed as `application/octet-stream`. The proof hash,
+        step index, chunk count and JSON-encoded public inputs are sent in
+        the `X-Proof-Hash`, `X-Step-Idx`, `X-Chunks` and `X-Public-Inputs`
+        headers. If the client accepts zstd (and `zstandard` is installed) the
+        body is compressed with `Content-Encoding: zstd`; the hash is always
+        of the uncompressed proof. Scratch files are removed once the
+        response has been sent.
     """
-    assert PROVER is not None
-    chunks = int(os.getenv("EZKL_CHUNKS","1"))
-    proof_paths, public_inputs = PROVER.prove_step_chunks(payload.dict(), chunks=chunks)
-    if len(proof_paths) > 1:
-        agg_path = os.path.join(os.path.dirname(proof_paths[0]), "aggregated.pf")
-        proof_path = PROVER.aggregate_chunk_proofs(proof_paths, agg_path)
-    else:
-        proof_path = proof_paths[0]
-
-    proof_bytes = open(proof_path, "rb").read()
-    proof_hash = hashlib.sha256(proof_bytes).hexdigest()
-    return {
-        "proof_bytes": proof_bytes,
-        "public_inputs": public_inputs,
-        "proof_hash": proof_hash,
-        "step_idx": payload.step_idx,
-        "chunks": chunks,
-    }
+    return _prove(payload.dict(), request)
+
+@app.post("/prove_step_bin")
+async def prove_step_bin(request: Request):
+    """Binary variant of `/prove_step` for large parameter vectors.
+
+    The body holds `w_flat`, `g_flat`, `m_flat` and `v_flat` back to back as
+    little-endian int32 or int64, optionally with `Content-Encoding: zstd`,
+    and the remaining fields are JSON in the `X-Step-Meta` header (see
+    `zk_autograd.prover_client.encode_step`). This
+    skips parsing and validating one JSON integer per parameter. The body is
+    read on the event loop; proving runs on the threadpool. Bodies are capped
+    at four int64 vectors of `PROVE_MAX_PARAMS` entries; a zstd body that
+    is malformed or would decompress past the cap is rejected with 400.
+
+    Args:
+        request: The incoming request.
+
+    Returns:
+        The same response as `/prove_step`.
+    """
+    # Four int64 vectors of at most PROVE_MAX_PARAMS entries each.
+    max_bytes = 4 * 8 * int(os.getenv("PROVE_MAX_PARAMS", str(1 << 22)))
+    body = await request.body()
+    if request.headers.get("content-encoding", "identity") == "zstd":
+        if zstd is None:
+            raise HTTPException(status_code=415, detail="zstd request bodies need zstandard installed")
+        try:
+            # Bounded output: the frame header's content size is client-controlled.
+            body = zstd.ZstdDecompressor().decompress(body, max_output_size=max_bytes)
+        except zstd.ZstdError as e:
+            raise HTTPException(status_code=400, detail=f"bad zstd body: {e}")
+    if len(body) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"body exceeds {max_bytes} bytes")
+    try:
+        raw = json.loads(request.headers.get(STEP_META_HEADER, "{}"))
+        payload = decode_step(body, StepMeta(**raw).dict(), dtype=raw.get("dtype", "<i8"))
+    except (TypeError, ValueError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return await anyio.to_thread.run_sync(_prove, payload, request)
@@ -9,9 +9,14 @@ Backends:
 
 Nitro attested calls should be validated by an anchor gateway in production.
 """
-import os, json, time
+import os, json, time, threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Tuple
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 class AnchorStore:
     """Abstract base class for anchor storage backends.
@@ -41,10 +46,37 @@ class AnchorStore:
         """
         ...
 
+    def anchor_root_batch(self, entries: List[Tuple[str, int, str, Dict]]):
+        """Anchors several Merkle roots at once.
+
+        Backends that can coalesce writes override this; the default simply
+        anchors each entry in turn.
+
+        Args:
+            entries: `(run_id, counter, merkle_root, meta)` tuples.
+        """
+        for run_id, counter, merkle_root, meta in entries:
+            self.anchor_root(run_id, counter, merkle_root, meta)
+
+    def flush(self):
+        """Writes any buffered state to durable storage. A no-op by default."""
+
 class LocalAnchorStore(AnchorStore):
     """Local filesystem implementation of AnchorStore.
 
     Stores anchors in a local JSON file. Useful for development and testing.
+    State is kept resident in memory. Each counter or anchor update appends
+    one line to `<path>.journal` and `flush` folds the journal back into the
+    JSON file, so an update costs O(1) I/O rather than a full rewrite.
+
+    Updates run under an exclusive lock on `<path>.lock` and first replay
+    any journal lines other stores or processes appended since, so stores
+    sharing a path never lose each other's counters or anchors. The full
+    file is re-read only when its inode, mtime or size changed. Every entry
+    carries a per-run sequence number, so replaying a journal that was
+    already folded in (after a crash mid-`flush`) is a no-op. Without `fcntl`
+    (Windows) only the in-process lock applies, and the file must have a
+    single writer.
     """
     def __init__(self, path="anchors.json"):
         """Initializes the LocalAnchorStore.
@@ -53,27 +85,118 @@ class LocalAnchorStore(AnchorStore):
             path: The path to the JSON file used for storage.
         """
         self.path = path
+        self.journal = f"{path}.journal"
+        self._lock = threading.RLock()
+        self._d = {}
+        self._seq = 0
+        self._stamp = None   # (st_ino, st_mtime_ns, st_size) of the loaded JSON file
+        self._jpos = None    # (st_ino, offset) read up to in the journal
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
 
     def _load(self):
         """Loads the anchor data from the JSON file."""
-        if os.path.exists(self.path): return json.load(open(self.path))
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
         return {}
 
     def _save(self, d):
-        """Saves the anchor data to the JSON file."""
-        Path(os.path.dirname(self.path) or ".").mkdir(parents=True, exist_ok=True)
-        json.dump(d, open(self.path, "w"), indent=2)
+        """Atomically replaces `path` with the given anchor data."""
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(d, f, indent=2)
+        os.replace(tmp, self.path)
+
+    @contextmanager
+    def _locked(self):
+        """Holds the in-process and file locks, with resident state up to date."""
+        with self._lock:
+            Path(os.path.dirname(self.path) or ".").mkdir(parents=True, exist_ok=True)
+            with open(f"{self.path}.lock", "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                self._refresh()
+                yield
+
+    def _refresh(self):
+        """Reloads the JSON file if it changed, then replays new journal lines."""
+        stamp = self._stat(self.path)
+        jst = self._stat(self.journal)
+        if stamp != self._stamp or (jst and self._jpos and jst[0] != self._jpos[0]):
+            self._d = self._load()
+            self._seq = max((rec.get("seq", 0) for rec in self._d.values()), default=0)
+            self._stamp, self._jpos = stamp, None
+        if jst is None:
+            self._jpos = None
+            return
+        ino, pos = self._jpos if self._jpos and self._jpos[0] == jst[0] else (jst[0], 0)
+        with open(self.journal, "rb") as f:
+            f.seek(pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a torn append; it was never acknowledged
+                self._apply(json.loads(line))
+                pos += len(line)
+        self._jpos = (ino, pos)
+
+    def _apply(self, op: Dict):
+        """Applies one journal entry to the resident state, unless already applied."""
+        self._seq = max(self._seq, op["seq"])
+        rec = self._d.setdefault(op["run_id"], {"counter": op["counter"], "anchors": []})
+        if op["seq"] <= rec.get("seq", 0):
+            return
+        rec["seq"] = op["seq"]
+        if "anchor" in op:
+            rec["anchors"].append(op["anchor"])
+        else:
+            rec["counter"] = op["counter"]
+
+    def _commit(self, ops: List[Dict]):
+        """Sequences, applies and journals `ops`; the caller holds `_locked`."""
+        for op in ops:
+            self._seq += 1
+            op["seq"] = self._seq
+            self._apply(op)
+        data = b"".join(json.dumps(op).encode() + b"\n" for op in ops)
+        with open(self.journal, "ab") as f:
+            f.write(data)
+            self._jpos = (os.fstat(f.fileno()).st_ino, f.tell())
+
+    def flush(self):
+        """Folds the journal into the JSON file and starts an empty journal."""
+        with self._locked():
+            if self._jpos is None:
+                return
+            self._save(self._d)
+            os.remove(self.journal)
+            self._stamp, self._jpos = self._stat(self.path), None
 
     def next_counter(self, run_id: str) -> int:
         """Retrieves and increments the monotonic counter for a given run ID."""
-        d = self._load(); d.setdefault(run_id, {"counter": 0, "anchors": []})
-        d[run_id]["counter"] += 1; self._save(d); return d[run_id]["counter"]
+        with self._locked():
+            rec = self._d.get(run_id)
+            counter = (rec["counter"] if rec else 0) + 1
+            self._commit([{"run_id": run_id, "counter": counter}])
+            return counter
 
     def anchor_root(self, run_id: str, counter: int, merkle_root: str, meta: Dict):
         """Anchors a Merkle root to a specific counter value."""
-        d = self._load(); d.setdefault(run_id, {"counter": counter, "anchors": []})
-        d[run_id]["anchors"].append({"counter": counter, "merkle_root": merkle_root, "time": int(time.time()), "meta": meta})
-        self._save(d)
+        self.anchor_root_batch([(run_id, counter, merkle_root, meta)])
+
+    def anchor_root_batch(self, entries: List[Tuple[str, int, str, Dict]]):
+        """Anchors several Merkle roots with a single journal append."""
+        now = int(time.time())
+        with self._locked():
+            self._commit([{"run_id": run_id, "counter": counter,
+                           "anchor": {"counter": counter, "merkle_root": merkle_root, "time": now, "meta": meta}}
+                          for run_id, counter, merkle_root, meta in entries])
 
 class DynamoAnchorStore(AnchorStore):
     """AWS DynamoDB implementation of AnchorStore.
@@ -90,6 +213,7 @@ class DynamoAnchorStore(AnchorStore):
         import boto3
         self.ddb = boto3.resource("dynamodb", region_name=region)
         self.table = self.ddb.Table(table_name)
+        self.client = self.ddb.meta.client
 
     def next_counter(self, run_id: str) -> int:
         """Retrieves and increments the monotonic counter using atomic updates."""
@@ -108,6 +232,34 @@ class DynamoAnchorStore(AnchorStore):
             ConditionExpression="attribute_not_exists(run_id) OR counter = :c",
             ExpressionAttributeValues={":c": counter})
 
+    def anchor_root_batch(self, entries: List[Tuple[str, int, str, Dict]]):
+        """Anchors several roots in as few round-trips as possible.
+
+        BatchWriteItem cannot carry condition expressions, so entries are sent
+        as TransactWriteItems of up to 100 conditional puts each. The table is
+        keyed by run ID, so a batch may hold at most one entry per run.
+
+        Raises:
+            ValueError: If two entries share a run ID.
+        """
+        seen = set()
+        for run_id, *_ in entries:
+            if run_id in seen:
+                raise ValueError(f"duplicate run_id in anchor batch: {run_id}")
+            seen.add(run_id)
+        from boto3.dynamodb.types import TypeSerializer
+        ser = TypeSerializer().serialize
+        now = int(time.time())
+        items = [{"Put": {
+            "TableName": self.table.name,
+            "Item": {k: ser(v) for k, v in {"run_id": run_id, "counter": counter, "merkle_root": merkle_root,
+                                            "meta": meta, "anchored_at": now}.items()},
+            "ConditionExpression": "attribute_not_exists(run_id) OR counter = :c",
+            "ExpressionAttributeValues": {":c": ser(counter)},
+        }} for run_id, counter, merkle_root, meta in entries]
+        for i in range(0, len(items), 100):
+            self.client.transact_write_items(TransactItems=items[i:i+100])
+
 def get_anchor_store(backend="local", **kwargs) -> AnchorStore:
     """Factory function to create an AnchorStore instance.
 
@@ -1,6 +1,14 @@
 import os, json, hashlib, time
 from dataclasses import dataclass, asdict
-from typing import List, Optional
+from typing import Iterator, List, Optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import blake3
+except ImportError:
+    blake3 = None
 
 @dataclass
 class LoggedStep:
@@ -45,7 +53,9 @@ def sha256_json(obj) -> str:
     """Computes the SHA256 hash of a JSON-serializable object.
 
     The object is first serialized to a JSON string with sorted keys to ensure
-    determinism.
+    determinism. This byte format is part of the digest, so it stays
+    `json.dumps(obj, sort_keys=True)` even when `orjson` is installed: orjson
+    cannot emit the same separators, floats or escapes.
 
     Args:
         obj: The object to hash.
@@ -67,13 +77,76 @@ def append_step(run_dir: str, step: LoggedStep):
     """
     os.makedirs(run_dir, exist_ok=True)
     fp = os.path.join(run_dir, "steps.jsonl")
-    with open(fp, "a", encoding="utf-8") as f:
-        f.write(json.dumps(asdict(step)) + "\n")
+    with open(fp, "ab") as f:
+        f.write(_encode_step(step))
+
+def _encode_step(step: LoggedStep) -> bytes:
+    """Serializes a step as one newline-terminated JSON line."""
+    if orjson is not None:
+        return orjson.dumps(asdict(step), option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(asdict(step)) + "\n").encode()
+
+class StepLogger:
+    """Appends steps to `steps.jsonl` through one long-lived file handle.
+
+    Unlike `append_step`, which opens and closes the file per step, the
+    handle stays open and writes are buffered until `flush` or `close`.
+    """
+    def __init__(self, run_dir: str, buffering: int = 1 << 20):
+        """Initializes the StepLogger.
+
+        Args:
+            run_dir: The directory of the training run.
+            buffering: Write buffer size in bytes.
+        """
+        os.makedirs(run_dir, exist_ok=True)
+        self._f = open(os.path.join(run_dir, "steps.jsonl"), "ab", buffering=buffering)
+
+    def append(self, step: LoggedStep):
+        """Buffers a step for appending to the log."""
+        self._f.write(_encode_step(step))
+
+    def flush(self):
+        """Writes buffered steps to disk."""
+        self._f.flush()
+
+    def close(self):
+        """Flushes and closes the log file."""
+        if not self._f.closed:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_log(run_dir: str) -> Iterator[LoggedStep]:
+    """Yields the steps of the run log one at a time.
+
+    Steps are parsed lazily from `steps.jsonl`, so memory use does not grow
+    with the length of the run.
+
+    Args:
+        run_dir: The directory of the training run.
+
+    Yields:
+        LoggedStep objects in log order.
+    """
+    fp = os.path.join(run_dir, "steps.jsonl")
+    if not os.path.exists(fp):
+        return
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(fp, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield LoggedStep(**loads(line))
 
 def load_log(run_dir: str) -> RunLog:
     """Loads the run log from the run directory.
 
     Reads the `steps.jsonl` file and the `merkle_root.txt` file (if present).
+    Use `iter_log` to stream the steps instead.
 
     Args:
         run_dir: The directory of the training run.
@@ -81,44 +154,86 @@ def load_log(run_dir: str) -> RunLog:
     Returns:
         A RunLog object containing the loaded steps and Merkle root.
     """
-    steps = []
-    fp = os.path.join(run_dir, "steps.jsonl")
-    if os.path.exists(fp):
-        with open(fp, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    steps.append(LoggedStep(**json.loads(line)))
+    steps = list(iter_log(run_dir))
     mr = None
     mr_fp = os.path.join(run_dir, "merkle_root.txt")
     if os.path.exists(mr_fp):
         mr = open(mr_fp).read().strip()
     return RunLog(run_dir=run_dir, steps=steps, merkle_root=mr)
 
-def compute_merkle_root(hashes: List[str]) -> str:
+# Above this many leaves, use the Numba kernel when it is installed; below
+# it, JIT dispatch costs more than the pure-Python loop.
+MERKLE_NATIVE_MIN_LEAVES = 1 << 16
+
+TREE_HASHES = ("sha256", "blake3")
+
+def _node_hash(tree_hash: str):
+    """Returns the hash constructor used for internal Merkle nodes."""
+    if tree_hash == "sha256":
+        return hashlib.sha256
+    if tree_hash == "blake3":
+        if blake3 is None:
+            raise RuntimeError("tree_hash='blake3' needs the blake3 package.")
+        return blake3.blake3
+    raise ValueError(f"unknown tree_hash {tree_hash!r}; expected one of {TREE_HASHES}")
+
+def compute_merkle_root(hashes: List[str], tree_hash: str = "sha256") -> str:
     """Computes the Merkle root of a list of hex hashes.
 
     The tree is built by pairwise hashing of the current layer. If a layer has
-    an odd number of elements, the last element is duplicated.
+    an odd number of elements, the last element is duplicated. Internal nodes
+    use SHA-256 by default; `tree_hash="blake3"` switches them (not the
+    leaves) to BLAKE3, which is several times faster with SIMD but yields a
+    different root, so it must be recorded alongside the root.
+
+    `hashlib.sha256` is OpenSSL's implementation, which already dispatches to
+    SHA-NI / ARMv8 SHA2 where the CPU has them. Nodes live in one contiguous
+    buffer that each layer overwrites in place, so sibling pairs are hashed
+    straight from a 64-byte view and no per-node objects are kept around.
+    Large runs go to the parallel Numba kernel in `merkle_kernels` instead.
 
     Args:
         hashes: A list of hexadecimal hash strings.
+        tree_hash: The internal node hash, "sha256" or "blake3".
 
     Returns:
         The hexadecimal representation of the Merkle root.
+
+    Raises:
+        ValueError: If `tree_hash` is unknown.
+        RuntimeError: If BLAKE3 is requested but not installed.
     """
+    node = _node_hash(tree_hash)
     if not hashes:
-        return sha256_bytes(b"")
-    layer = [bytes.fromhex(h) for h in hashes]
-    while len(layer) > 1:
-        nxt = []
-        for i in range(0, len(layer), 2):
-            left = layer[i]
-            right = layer[i+1] if i+1 < len(layer) else left
-            nxt.append(hashlib.sha256(left + right).digest())
-        layer = nxt
-    return layer[0].hex()
-
-def finalize_run(run_dir: str):
+        return node(b"").hexdigest()
+    if any(len(h) != 64 for h in hashes):
+        # Non-SHA-256 leaves: nodes vary in size, so keep them as a list.
+        layer = [bytes.fromhex(h) for h in hashes]
+        while len(layer) > 1:
+            if len(layer) % 2:
+                layer.append(layer[-1])
+            pairs = iter(layer)
+            layer = [node(left + right).digest() for left, right in zip(pairs, pairs)]
+        return layer[0].hex()
+    if tree_hash == "sha256" and len(hashes) >= MERKLE_NATIVE_MIN_LEAVES:
+        from zk_autograd import merkle_kernels
+        if merkle_kernels.available():
+            return merkle_kernels.merkle_root(bytes.fromhex("".join(hashes))).hex()
+    # One spare slot for duplicating the last node of an odd layer.
+    buf = memoryview(bytearray(32 * (len(hashes) + 1)))
+    for i, h in enumerate(hashes):
+        buf[i*32:i*32+32] = bytes.fromhex(h)
+    n = len(hashes) * 32
+    while n > 32:
+        if n % 64:
+            buf[n:n+32] = buf[n-32:n]
+            n += 32
+        for i in range(0, n, 64):
+            buf[i//2:i//2+32] = node(buf[i:i+64]).digest()
+        n //= 2
+    return buf[:32].hex()
+
+def finalize_run(run_dir: str, logger: Optional[StepLogger] = None, tree_hash: str = "sha256"):
     """Finalizes the run by computing the Merkle root and writing the manifest.
 
     This function loads the current log, computes the Merkle root of all proof
@@ -127,18 +242,25 @@ def finalize_run(run_dir: str):
 
     Args:
         run_dir: The directory of the training run.
+        logger: The run's StepLogger, if any. It is closed before the log is
+            read so buffered steps are included.
+        tree_hash: The Merkle node hash (see `compute_merkle_root`); it is
+            recorded in the manifest so the root can be recomputed.
 
     Returns:
         A dictionary representing the run manifest.
     """
+    if logger is not None:
+        logger.close()
     log = load_log(run_dir)
-    root = compute_merkle_root([s.proof_hash for s in log.steps])
+    root = compute_merkle_root([s.proof_hash for s in log.steps], tree_hash=tree_hash)
     with open(os.path.join(run_dir, "merkle_root.txt"), "w", encoding="utf-8") as f:
         f.write(root)
     manifest = {
         "run_dir": run_dir,
         "num_steps": len(log.steps),
         "merkle_root": root,
+        "tree_hash": tree_hash,
         "created_at": time.time(),
         "steps_file": "steps.jsonl",
         "proofs_dir": "proofs"
@@ -16,6 +16,7 @@ class Tunables:
         artifact_dir: Directory to store training artifacts.
         anchor_backend: Backend for anchor storage ("local", "aws-dynamo", "oci-object").
         anchor_table: Name of the anchor table (for DynamoDB).
+        tree_hash: Merkle node hash for the audit log ("sha256" or "blake3").
     """
     scale: int = 1000          # fixed-point scale for ZK input
     prove_every_n: int = 1     # prove each step in PoC
@@ -33,3 +34,6 @@ class Tunables:
     # Anchoring / replay defense
     anchor_backend: str = "local"   # local | aws-dynamo | oci-object
     anchor_table: str = "zk_autograd_runs"
+
+    # Audit log Merkle tree node hash: sha256 | blake3
+    tree_hash: str = "sha256"
@@ -12,25 +12,48 @@ keys should be encrypted in KMS/Vault and released only on valid attestation.
 Usage:
   zk-setup-zk --circuit adam --dim 128 --out prover/keys
 """
-import os, json, argparse
+import os, json, hashlib, argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import ezkl
 from ezkl import PyRunArgs, PyCommitments
 from zk_autograd.step_circuit import export_sgd_onnx, export_adam_onnx
 
-def ensure_setup(circuit: str, dim: int, out_dir: str, logrows: int = 12, commitment: str = "KZG"):
+MANIFEST = "manifest.json"
+
+def _stat(path: str):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+def _load_manifest(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def ensure_setup(circuit: str, dim: int, out_dir: str, logrows: int = 12, commitment: str = "KZG",
+                 force: bool = False):
     """Prepares the EZKL artifacts for a given circuit.
 
     This function exports the PyTorch model to ONNX, generates the EZKL settings,
     fetches the SRS (Structured Reference String), compiles the circuit, and
     generates the proving and verification keys.
 
+    Each stage is skipped when `manifest.json` in `out_dir` shows its outputs
+    were produced for the same parameters and have not changed since (size and
+    mtime). The ONNX export always runs its own source-hash check, so editing
+    the step module reruns every stage. Once a stage reruns, every later stage reruns too. The SRS fetch
+    (network/disk bound) runs on a background thread while the circuit
+    compiles, since both only depend on the settings.
+
     Args:
         circuit: The name of the circuit ("sgd" or "adam").
         dim: The dimension of the weight/gradient vectors.
         out_dir: The output directory for the artifacts.
         logrows: The number of rows in the circuit (log2).
         commitment: The commitment scheme ("KZG" or "IPA").
+        force: Rerun every stage regardless of the manifest.
 
     Returns:
         A dictionary containing the paths to the generated artifacts.
@@ -45,10 +68,40 @@ def ensure_setup(circuit: str, dim: int, out_dir: str, logrows: int = 12, commit
         "srs": os.path.join(out_dir, "kzg.srs")
     }
 
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    params = hashlib.sha256(json.dumps([circuit, dim, logrows, commitment.upper()]).encode()).hexdigest()
+    manifest = {} if force else _load_manifest(manifest_path)
+    if manifest.get("params") != params:
+        manifest = {"params": params, "artifacts": {}}
+    # Read back by the prover to size its warm-up payload.
+    manifest["circuit"], manifest["dim"] = circuit, dim
+    recorded = manifest["artifacts"]
+    stale = False
+
+    def fresh(*names):
+        return not stale and all(
+            os.path.exists(artifacts[n]) and recorded.get(n) == _stat(artifacts[n]) for n in names)
+
+    def done(*names):
+        for n in names:
+            recorded[n] = _stat(artifacts[n])
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    # Always export: the exporter skips itself unless the step module's
+    # source (or shapes) changed, and a re-export bumps the ONNX stat below,
+    # so circuit edits regenerate every later stage.
+    if force:
+        try:
+            os.remove(artifacts["onnx"] + ".meta")
+        except FileNotFoundError:
+            pass
     if circuit == "sgd":
         export_sgd_onnx(artifacts["onnx"], dim=dim)
     else:
         export_adam_onnx(artifacts["onnx"], dim=dim)
+    if not fresh("onnx"):
+        done("onnx"); stale = True
 
     run_args = PyRunArgs()
     run_args.logrows = logrows
@@ -57,16 +110,27 @@ def ensure_setup(circuit: str, dim: int, out_dir: str, logrows: int = 12, commit
     run_args.commitment = PyCommitments.KZG if commitment.upper()=="KZG" else PyCommitments.IPA
 
     # 1) settings
-    ezkl.gen_settings(model=artifacts["onnx"], output=artifacts["settings"], py_run_args=run_args)
-
-    # 2) SRS (KZG)
-    ezkl.get_srs(settings_path=artifacts["settings"], srs_path=artifacts["srs"], commitment=run_args.commitment)
-
-    # 3) compile circuit
-    ezkl.compile_circuit(model=artifacts["onnx"], compiled_circuit=artifacts["compiled"], settings_path=artifacts["settings"])
+    if not fresh("settings"):
+        ezkl.gen_settings(model=artifacts["onnx"], output=artifacts["settings"], py_run_args=run_args)
+        done("settings"); stale = True
+
+    # 2) SRS (KZG) in the background while 3) the circuit compiles
+    srs_ok, compiled_ok = fresh("srs"), fresh("compiled")
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        srs_job = None if srs_ok else ex.submit(
+            ezkl.get_srs, settings_path=artifacts["settings"], srs_path=artifacts["srs"], commitment=run_args.commitment)
+        if not compiled_ok:
+            ezkl.compile_circuit(model=artifacts["onnx"], compiled_circuit=artifacts["compiled"], settings_path=artifacts["settings"])
+            done("compiled")
+        if srs_job is not None:
+            srs_job.result()
+            done("srs")
+    stale = stale or not (srs_ok and compiled_ok)
 
     # 4) setup keys
-    ezkl.setup(model=artifacts["compiled"], vk_path=artifacts["vk"], pk_path=artifacts["pk"], srs_path=artifacts["srs"])
+    if not fresh("pk", "vk"):
+        ezkl.setup(model=artifacts["compiled"], vk_path=artifacts["vk"], pk_path=artifacts["pk"], srs_path=artifacts["srs"])
+        done("pk", "vk")
 
     return artifacts
 
@@ -76,8 +140,9 @@ def cli():
     ap.add_argument("--dim", type=int, default=128)
     ap.add_argument("--out", default="prover/keys")
     ap.add_argument("--logrows", type=int, default=12)
+    ap.add_argument("--force", action="store_true", help="rerun every stage even if artifacts are up to date")
     args = ap.parse_args()
-    arts = ensure_setup(args.circuit, args.dim, args.out, args.logrows)
+    arts = ensure_setup(args.circuit, args.dim, args.out, args.logrows, force=args.force)
     print(json.dumps(arts, indent=2))
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+"""merkle_kernels.py
+
+Optional Numba Merkle-root kernel for runs with many steps.
+
+Every internal node hashes exactly 64 bytes (two SHA-256 digests), so the
+kernel carries a SHA-256 specialised to that size: one data block plus a
+constant padding block whose message schedule is precomputed. Pairs within
+a layer are independent and are hashed in parallel.
+"""
+from __future__ import annotations
+import numpy as np
+try:
+    import numba
+except Exception:
+    numba = None
+
+def available() -> bool:
+    """Checks if Numba is installed.
+
+    Returns:
+        True if the native kernel can be used, False otherwise.
+    """
+    return numba is not None
+
+_K = np.array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+], dtype=np.int64)
+
+_H0 = np.array([
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+], dtype=np.int64)
+
+def _pad_schedule() -> np.ndarray:
+    """Message schedule of the padding block that follows a 64-byte message.
+
+    Words are held in int64 (not uint32) throughout the kernel so Numba never
+    mixes signed and unsigned operands; every intermediate fits in 63 bits.
+    """
+    M = 0xFFFFFFFF
+    rotr = lambda x, n: ((x >> n) | (x << (32 - n))) & M
+    w = [0x80000000] + [0] * 14 + [512]
+    for i in range(16, 64):
+        s0 = rotr(w[i-15], 7) ^ rotr(w[i-15], 18) ^ (w[i-15] >> 3)
+        s1 = rotr(w[i-2], 17) ^ rotr(w[i-2], 19) ^ (w[i-2] >> 10)
+        w.append((w[i-16] + s0 + w[i-7] + s1) & M)
+    return np.array(w, dtype=np.int64)
+
+_W_PAD = _pad_schedule()
+
+if numba is not None:
+    @numba.njit(inline="always")
+    def _rotr(x, n):
+        return ((x >> n) | (x << (32 - n))) & 0xFFFFFFFF
+
+    @numba.njit(inline="always")
+    def _compress(h, w, K):
+        a, b, c, d, e, f, g, hh = h[0], h[1], h[2], h[3], h[4], h[5], h[6], h[7]
+        for i in range(64):
+            s1 = _rotr(e, 6) ^ _rotr(e, 11) ^ _rotr(e, 25)
+            ch = (e & f) ^ (~e & 0xFFFFFFFF & g)
+            t1 = (hh + s1 + ch + K[i] + w[i]) & 0xFFFFFFFF
+            s0 = _rotr(a, 2) ^ _rotr(a, 13) ^ _rotr(a, 22)
+            maj = (a & b) ^ (a & c) ^ (b & c)
+            t2 = (s0 + maj) & 0xFFFFFFFF
+            hh = g; g = f; f = e
+            e = (d + t1) & 0xFFFFFFFF
+            d = c; c = b; b = a
+            a = (t1 + t2) & 0xFFFFFFFF
+        h[0] = (h[0] + a) & 0xFFFFFFFF; h[1] = (h[1] + b) & 0xFFFFFFFF
+        h[2] = (h[2] + c) & 0xFFFFFFFF; h[3] = (h[3] + d) & 0xFFFFFFFF
+        h[4] = (h[4] + e) & 0xFFFFFFFF; h[5] = (h[5] + f) & 0xFFFFFFFF
+        h[6] = (h[6] + g) & 0xFFFFFFFF; h[7] = (h[7] + hh) & 0xFFFFFFFF
+
+    @numba.njit(inline="always")
+    def _hash_pair(src, j, dst, K, H0, W_PAD):
+        w = np.empty(64, np.int64)
+        for i in range(16):
+            o = 2 * j * 32 + 4 * i
+            w[i] = ((np.int64(src[o]) << 24) | (np.int64(src[o+1]) << 16)
+                    | (np.int64(src[o+2]) << 8) | np.int64(src[o+3]))
+        for i in range(16, 64):
+            s0 = _rotr(w[i-15], 7) ^ _rotr(w[i-15], 18) ^ (w[i-15] >> 3)
+            s1 = _rotr(w[i-2], 17) ^ _rotr(w[i-2], 19) ^ (w[i-2] >> 10)
+            w[i] = (w[i-16] + s0 + w[i-7] + s1) & 0xFFFFFFFF
+        h = H0.copy()
+        _compress(h, w, K)
+        _compress(h, W_PAD, K)
+        for i in range(8):
+            o = j * 32 + 4 * i
+            dst[o] = np.uint8(h[i] >> 24); dst[o+1] = np.uint8((h[i] >> 16) & 0xFF)
+            dst[o+2] = np.uint8((h[i] >> 8) & 0xFF); dst[o+3] = np.uint8(h[i] & 0xFF)
+
+    @numba.njit(parallel=True, cache=True)
+    def _merkle_root(src, n, K, H0, W_PAD):
+        dst = np.empty_like(src)
+        while n > 1:
+            if n % 2:
+                src[n*32:(n+1)*32] = src[(n-1)*32:n*32]
+                n += 1
+            half = n // 2
+            for j in numba.prange(half):
+                _hash_pair(src, j, dst, K, H0, W_PAD)
+            src, dst = dst, src
+            n = half
+        return src[:32].copy()
+
+def merkle_root(leaves: bytes) -> bytes:
+    """Computes the Merkle root of concatenated 32-byte leaves with Numba.
+
+    Odd layers duplicate their last node, matching
+    `audit_log.compute_merkle_root`.
+
+    Args:
+        leaves: The leaf digests, concatenated (length a non-zero multiple of 32).
+
+    Returns:
+        The 32-byte Merkle root.
+    """
+    assert available(), "Numba not available."
+    n = len(leaves) // 32
+    buf = np.zeros((n + 1) * 32, dtype=np.uint8)
+    buf[:n * 32] = np.frombuffer(leaves, dtype=np.uint8)
+    return _merkle_root(buf, n, _K, _H0, _W_PAD).tobytes()
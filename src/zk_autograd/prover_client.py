@@ -1,22 +1,118 @@
 import os, requests, json
-from typing import Dict, Any
+import numpy as np
+from typing import Dict, Any, Tuple
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+FLAT_KEYS = ("w_flat", "g_flat", "m_flat", "v_flat")
+STEP_META_HEADER = "X-Step-Meta"
+WIRE_DTYPES = ("<i4", "<i8")
+
+def encode_step(payload: Dict[str, Any]) -> Tuple[bytes, str]:
+    """Encodes a step payload for `POST /prove_step_bin`.
+
+    The four flat vectors are sent back to back as little-endian integers in
+    the request body: int32 if every value fits, int64 otherwise. Every other
+    field, plus the chosen `dtype`, goes JSON-encoded in the `X-Step-Meta`
+    header.
+
+    Args:
+        payload: The step payload; the flat vectors may be arrays or lists of
+            equal length.
+
+    Returns:
+        A tuple (body, meta) of the request body and the header value.
+    """
+    flats = [np.asarray(payload[k]) for k in FLAT_KEYS]
+    i32 = np.iinfo(np.int32)
+    narrow = all(a.size == 0 or (a.min() >= i32.min and a.max() <= i32.max) for a in flats)
+    dtype = WIRE_DTYPES[0] if narrow else WIRE_DTYPES[1]
+    body = b"".join(np.ascontiguousarray(a, dtype=dtype) for a in flats)
+    meta = {k: v for k, v in payload.items() if k not in FLAT_KEYS}
+    meta["dtype"] = dtype
+    return body, json.dumps(meta)
+
+def decode_step(body: bytes, meta: Dict[str, Any], dtype: str = "<i8") -> Dict[str, Any]:
+    """Decodes a request produced by `encode_step` without copying the body.
+
+    Args:
+        body: The request body.
+        meta: The decoded `X-Step-Meta` header, without `dtype`.
+        dtype: The wire dtype from the header.
+
+    Returns:
+        The step payload, with the flat vectors as read-only integer arrays.
+
+    Raises:
+        ValueError: If the dtype is unknown or the body does not hold four
+            equal-length vectors.
+    """
+    if dtype not in WIRE_DTYPES:
+        raise ValueError(f"unsupported wire dtype {dtype!r}")
+    width = np.dtype(dtype).itemsize
+    if len(body) % (width * len(FLAT_KEYS)):
+        raise ValueError("body is not four equal-length integer vectors")
+    flats = np.frombuffer(body, dtype=dtype).reshape(len(FLAT_KEYS), -1)
+    return dict(meta, **dict(zip(FLAT_KEYS, flats)))
+
+def json_body(payload: Dict[str, Any]) -> bytes:
+    """Serializes a step payload for the JSON `POST /prove_step` endpoint.
+
+    With `orjson` installed, NumPy vectors are written straight from the
+    array buffers; otherwise they go through `tolist()`.
+
+    Args:
+        payload: The step payload; the flat vectors may be arrays or lists.
+
+    Returns:
+        The UTF-8 JSON request body.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps({k: v.tolist() if isinstance(v, np.ndarray) else v
+                       for k, v in payload.items()}).encode()
 
 class ProverClient:
     """Client for interacting with the remote prover service.
 
     This client handles sending proof requests to the prover service.
     """
-    def __init__(self, url: str):
+    def __init__(self, url: str, compress: bool | None = None, binary: bool = True):
         """Initializes the ProverClient.
 
         Args:
             url: The base URL of the prover service.
+            compress: Whether to zstd-compress binary payloads. Defaults to
+                the `PROVER_ZSTD` environment variable ("1" enables it);
+                needs `zstandard` on both ends.
+            binary: Whether to post NumPy payloads to `/prove_step_bin`. If
+                False (e.g. for a prover without that endpoint) they are sent
+                as JSON to `/prove_step`.
         """
         self.url = url.rstrip("/")
+        self.binary = binary
+        if compress is None:
+            compress = os.getenv("PROVER_ZSTD", "0") == "1"
+        self.compress = compress and zstd is not None
 
     def prove_step(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Requests a proof for a single training step.
 
+        If the flat vectors are NumPy arrays they are posted as raw int32/int64
+        to `/prove_step_bin` (see `encode_step`), optionally zstd-compressed,
+        instead of as JSON lists.
+
+        The proof arrives as a raw binary body. When `zstandard` is installed,
+        urllib3 advertises `zstd` in `Accept-Encoding` and decodes the
+        compressed body transparently, so `proof_bytes` is always the
+        uncompressed proof.
+
         Args:
             payload: A dictionary containing the inputs for the proof generation
                 (weights, gradients, optimizer state, etc.).
@@ -27,6 +123,21 @@ class ProverClient:
         Raises:
             requests.exceptions.HTTPError: If the request fails.
         """
-        r = requests.post(self.url + "/prove_step", json=payload, timeout=300)
+        if self.binary and isinstance(payload[FLAT_KEYS[0]], np.ndarray):
+            body, meta = encode_step(payload)
+            headers = {"Content-Type": "application/octet-stream", STEP_META_HEADER: meta}
+            if self.compress:
+                body = zstd.ZstdCompressor(level=1).compress(body)
+                headers["Content-Encoding"] = "zstd"
+            r = requests.post(self.url + "/prove_step_bin", data=body, timeout=300, headers=headers)
+        else:
+            r = requests.post(self.url + "/prove_step", data=json_body(payload), timeout=300,
+                              headers={"Content-Type": "application/json"})
         r.raise_for_status()
-        return r.json()
+        return {
+            "proof_bytes": r.content,
+            "proof_hash": r.headers["X-Proof-Hash"],
+            "public_inputs": json.loads(r.headers["X-Public-Inputs"]),
+            "step_idx": int(r.headers["X-Step-Idx"]),
+            "chunks": int(r.headers["X-Chunks"]),
+        }
@@ -1,6 +1,29 @@
 import numpy as np
 import torch
-from typing import Dict
+from typing import Dict, Optional, Sequence
+try:
+    import numba
+except Exception:
+    numba = None
+
+MERSENNE_61 = 2**61 - 1
+# Below this many elements np.mod is as fast as the kernel and avoids JIT warm-up.
+FIELD_NATIVE_MIN = 1 << 16
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _mod_mersenne61(q):
+        # x = hi * 2**61 + lo with 2**61 == 1 (mod p), so x == hi + lo. The
+        # arithmetic shift keeps hi in [-4, 3], so one correction suffices.
+        out = np.empty_like(q)
+        for i in numba.prange(q.size):
+            r = (q[i] & MERSENNE_61) + (q[i] >> 61)
+            if r < 0:
+                r += MERSENNE_61
+            elif r >= MERSENNE_61:
+                r -= MERSENNE_61
+            out[i] = r
+        return out
 
 def quantize_tensor(t: torch.Tensor, scale: int) -> np.ndarray:
     """Quantizes a PyTorch tensor to fixed-point integers.
@@ -12,8 +35,7 @@ def quantize_tensor(t: torch.Tensor, scale: int) -> np.ndarray:
     Returns:
         A numpy array of int64 values.
     """
-    x = t.detach().cpu().numpy()
-    return np.round(x * scale).astype(np.int64)
+    return torch.round(t.detach() * scale).to(torch.int64).cpu().numpy()
 
 def dequantize_tensor(q: np.ndarray, scale: int) -> np.ndarray:
     """Dequantizes a fixed-point array back to floating point.
@@ -27,26 +49,54 @@ def dequantize_tensor(q: np.ndarray, scale: int) -> np.ndarray:
     """
     return q.astype(np.float64) / scale
 
-def flatten_params(d: Dict[str, torch.Tensor], scale: int) -> np.ndarray:
+def flatten_params(d: Dict[str, torch.Tensor], scale: int,
+                   order: Optional[Sequence[str]] = None) -> np.ndarray:
     """Flattens and quantizes a dictionary of tensors.
 
-    The tensors are sorted by key to ensure deterministic ordering.
+    The tensors are sorted by key to ensure deterministic ordering. They are
+    concatenated and quantized on their own device, so there is a single
+    device-to-host transfer however many tensors there are.
 
     Args:
         d: A dictionary mapping parameter names to tensors.
         scale: The scaling factor for quantization.
+        order: Precomputed key order, e.g. sorted once per model; defaults
+            to sorting the keys of `d`.
 
     Returns:
         A single 1D numpy array containing all quantized values.
     """
-    flats = []
-    for _, v in sorted(d.items()):
-        flats.append(quantize_tensor(v.reshape(-1), scale))
-    return np.concatenate(flats)
+    order = sorted(d) if order is None else order
+    flat = torch.cat([d[k].detach().reshape(-1) for k in order])
+    return quantize_tensor(flat, scale)
+
+def stack_params(ds: Sequence[Dict[str, torch.Tensor]], scale: int,
+                 order: Optional[Sequence[str]] = None) -> np.ndarray:
+    """Flattens and quantizes several same-shaped dictionaries at once.
 
-def to_field_ints(q: np.ndarray, prime: int = 2**61 - 1) -> np.ndarray:
+    Equivalent to stacking `flatten_params(d, scale, order)` for each `d`,
+    but the rows are built into one (len(ds), N) tensor, so there is a single
+    quantize kernel and a single device-to-host transfer for all of them.
+
+    Args:
+        ds: Dictionaries mapping the same parameter names to tensors.
+        scale: The scaling factor for quantization.
+        order: Precomputed key order; defaults to the sorted keys of `ds[0]`.
+
+    Returns:
+        An int64 array with one contiguous row per dictionary.
+    """
+    order = sorted(ds[0]) if order is None else order
+    stacked = torch.stack([torch.cat([d[k].detach().reshape(-1) for k in order]) for d in ds])
+    return quantize_tensor(stacked, scale)
+
+def to_field_ints(q: np.ndarray, prime: int = MERSENNE_61) -> np.ndarray:
     """Maps integers to a finite field.
 
+    Large int64 inputs modulo the default Mersenne prime are reduced with a
+    shift-and-add Numba kernel when Numba is installed; the result is the
+    same as `np.mod`, including for negative inputs.
+
     Args:
         q: The input array of integers.
         prime: The prime modulus of the field.
@@ -54,4 +104,7 @@ def to_field_ints(q: np.ndarray, prime: int = 2**61 - 1) -> np.ndarray:
     Returns:
         A numpy array of field elements (integers modulo prime).
     """
+    q = np.asarray(q)
+    if numba is not None and prime == MERSENNE_61 and q.dtype == np.int64 and q.size >= FIELD_NATIVE_MIN:
+        return _mod_mersenne61(np.ascontiguousarray(q).reshape(-1)).reshape(q.shape)
     return np.mod(q, prime).astype(np.int64)
@@ -0,0 +1,116 @@
+"""runs_index.py
+
+Schema and emitter for the run listing the static webapp fetches.
+
+Runs are appended to `runs.ndjson`, one JSON row per line, and the byte
+offset of each row is appended to `runs.index` (little-endian uint64), so
+readers can fetch only the rows added since their last offset. `runs.json`
+is kept as a compat view and rebuilt from the NDJSON file when stale.
+"""
+import os
+from typing import Iterator, List
+from pydantic import BaseModel, TypeAdapter
+
+RUNS_NDJSON = "runs.ndjson"
+RUNS_INDEX = "runs.index"
+RUNS_JSON = "runs.json"
+
+class RunEntry(BaseModel):
+    """One published run, as rendered by `webapp/app.js`.
+
+    Attributes:
+        name: The run directory name.
+        merkle_root: The Merkle root from the run manifest.
+        num_steps: The number of logged steps.
+        torrent_file: Path of the toy torrent manifest, relative to the site.
+        magnet: Magnet link for the run bundle.
+    """
+    name: str
+    merkle_root: str
+    num_steps: int
+    torrent_file: str
+    magnet: str
+
+RUNS = TypeAdapter(List[RunEntry])
+
+def decode_runs(data: bytes) -> List[RunEntry]:
+    """Parses and validates a `runs.json` document in one pass.
+
+    pydantic-core parses the JSON and checks every row natively, with no
+    intermediate dicts.
+
+    Args:
+        data: The raw `runs.json` bytes.
+
+    Returns:
+        The validated run entries.
+
+    Raises:
+        pydantic.ValidationError: If the document is not a list of run entries.
+    """
+    return RUNS.validate_json(data)
+
+def append_run(site_dir: str, entry: RunEntry) -> int:
+    """Appends one run to `runs.ndjson` and records its offset in `runs.index`.
+
+    Only the new row is written; existing rows are never rewritten.
+
+    Args:
+        site_dir: The directory the site is published from.
+        entry: The run to append.
+
+    Returns:
+        The byte offset of the new row in `runs.ndjson`.
+    """
+    os.makedirs(site_dir, exist_ok=True)
+    row = entry.model_dump_json().encode() + b"\n"
+    with open(os.path.join(site_dir, RUNS_NDJSON), "ab") as f:
+        offset = f.seek(0, os.SEEK_END)
+        f.write(row)
+    with open(os.path.join(site_dir, RUNS_INDEX), "ab") as f:
+        f.write(offset.to_bytes(8, "little"))
+    return offset
+
+def iter_runs(site_dir: str, offset: int = 0) -> Iterator[RunEntry]:
+    """Yields the runs in `runs.ndjson` from a byte offset onwards.
+
+    Args:
+        site_dir: The directory the site is published from.
+        offset: Where to start reading, e.g. an entry of `runs.index`.
+
+    Yields:
+        Validated RunEntry objects in append order.
+    """
+    fp = os.path.join(site_dir, RUNS_NDJSON)
+    if not os.path.exists(fp):
+        return
+    with open(fp, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if line.strip():
+                yield RunEntry.model_validate_json(line)
+
+def build_runs_json(site_dir: str) -> str:
+    """Rebuilds the `runs.json` compat view if `runs.ndjson` is newer.
+
+    Rows are already serialized JSON objects, so the array is assembled
+    from the raw lines without re-encoding them.
+
+    Args:
+        site_dir: The directory the site is published from.
+
+    Returns:
+        The path to `runs.json`.
+    """
+    src = os.path.join(site_dir, RUNS_NDJSON)
+    dst = os.path.join(site_dir, RUNS_JSON)
+    if os.path.exists(dst) and (not os.path.exists(src)
+                                or os.stat(dst).st_mtime_ns > os.stat(src).st_mtime_ns):
+        return dst
+    rows = []
+    if os.path.exists(src):
+        with open(src, "rb") as f:
+            rows = [line.rstrip(b"\n") for line in f if line.strip()]
+    with open(dst, "wb") as f:
+        f.write(b"[" + b",".join(rows) + b"]")
+    return dst
@@ -6,9 +6,25 @@ Proof splitting per-layer/per-block and EZKL aggregation.
 - Falls back to logical block splitting for PoC.
 """
 from __future__ import annotations
-import os, json, subprocess, shutil, hashlib
+import os, json, mmap, logging, subprocess, shutil, hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict
+from zk_autograd.audit_log import TREE_HASHES, compute_merkle_root
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ezkl as _ezkl_py
+except ImportError:
+    _ezkl_py = None
+
+log = logging.getLogger(__name__)
 
 def plan_split(model_onnx: str, chunks: int = 1, out_dir: str = "prover/keys/chunks") -> Dict:
     """Plans the splitting of an ONNX model into multiple chunks for parallel proving.
@@ -27,6 +43,8 @@ def plan_split(model_onnx: str, chunks: int = 1, out_dir: str = "prover/keys/chu
     Path(out_dir).mkdir(parents=True, exist_ok=True)
     plan = {"model": model_onnx, "chunks": chunks, "out_dir": out_dir, "strategy": "logical-block"}
     if shutil.which("ezkl") and chunks > 1:
+        # One invocation emits every part (--parts); there is no per-chunk
+        # command to fan out, and ezkl parallelises the split internally.
         try:
             subprocess.check_call(
                 ["ezkl", "split-model", "--model", model_onnx, "--parts", str(chunks), "--out", out_dir]
@@ -34,24 +52,90 @@ def plan_split(model_onnx: str, chunks: int = 1, out_dir: str = "prover/keys/chu
             plan["strategy"] = "ezkl-split-model"
         except Exception:
             pass
-    with open(os.path.join(out_dir, "split_plan.json"), "w", encoding="utf-8") as f:
-        json.dump(plan, f, indent=2)
+    if orjson is not None:
+        buf = orjson.dumps(plan, option=orjson.OPT_INDENT_2)
+    else:
+        buf = json.dumps(plan, indent=2).encode()
+    with open(os.path.join(out_dir, "split_plan.json"), "wb", buffering=0) as f:
+        f.write(buf)
     return plan
 
-def aggregate_proofs(chunk_proofs: List[str], out_proof: str) -> str:
+def _proof_leaf(path: str, tree_hash: str = "sha256") -> str:
+    """Hash of one proof file.
+
+    Hashed from a read-only mmap, so OpenSSL gets the whole file as one
+    contiguous buffer with no copies. Files that cannot be mapped (empty
+    files, pipes) go through `hashlib.file_digest` or a plain read instead.
+    With `tree_hash="blake3"` the file goes to BLAKE3's own mmap reader,
+    which hashes one large input on several cores.
+    """
+    if tree_hash == "blake3":
+        h = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        h.update_mmap(path)
+        return h.hexdigest()
+    with open(path, "rb", buffering=0) as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return hashlib.sha256(mm).hexdigest()
+        except (ValueError, OSError):
+            pass
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        return hashlib.sha256(f.read()).hexdigest()
+
+def ezkl_aggregation_available(vk_path: str | None = None, srs_path: str | None = None) -> bool:
+    """Whether `aggregate_proofs` would aggregate with EZKL rather than hashing.
+
+    Args:
+        vk_path: The verification key that would be passed to `aggregate_proofs`.
+        srs_path: The SRS that would be passed to `aggregate_proofs`.
+
+    Returns:
+        True if the EZKL bindings (given the keys) or the EZKL CLI are usable.
+    """
+    return bool(vk_path and srs_path and hasattr(_ezkl_py, "aggregate")) or bool(shutil.which("ezkl"))
+
+def aggregate_proofs(chunk_proofs: List[str], out_proof: str, tree_hash: str = "sha256",
+                     vk_path: str | None = None, srs_path: str | None = None) -> str:
     """Aggregates multiple partial proofs into a single proof.
 
-    If EZKL is available, it uses `ezkl aggregate`. Otherwise, it performs a
-    mock aggregation by hashing the input proofs (PoC).
+    Given the keys, and EZKL Python bindings that expose `aggregate`, the
+    proofs are aggregated in-process without forking an `ezkl` binary. Else
+    if the EZKL CLI is available, it uses `ezkl aggregate`. Otherwise, it
+    performs a mock aggregation (PoC): each distinct proof file is hashed as
+    a leaf, in parallel, and the result is the Merkle root of the leaves in
+    input order, built like the audit log's (`compute_merkle_root`).
 
     Args:
         chunk_proofs: A list of paths to the partial proofs.
         out_proof: The output path for the aggregated proof.
+        tree_hash: The fallback's hash for leaves and nodes, "sha256" or
+            "blake3". BLAKE3 is faster on large proofs but gives a
+            different root.
+        vk_path: The verification key, for in-process EZKL aggregation.
+        srs_path: The SRS, for in-process EZKL aggregation.
 
     Returns:
         The path to the aggregated proof.
+
+    Raises:
+        ValueError: If `tree_hash` is unknown.
+        RuntimeError: If BLAKE3 is requested but not installed.
     """
+    if tree_hash not in TREE_HASHES:
+        raise ValueError(f"unknown tree_hash {tree_hash!r}; expected one of {TREE_HASHES}")
+    if tree_hash == "blake3" and blake3 is None:
+        raise RuntimeError("tree_hash='blake3' needs the blake3 package.")
     Path(os.path.dirname(out_proof)).mkdir(parents=True, exist_ok=True)
+    if vk_path and srs_path and hasattr(_ezkl_py, "aggregate"):
+        try:
+            _ezkl_py.aggregate(proof_paths=list(chunk_proofs), vk_path=vk_path,
+                               srs_path=srs_path, output_path=out_proof)
+            return out_proof
+        except TypeError:
+            # An ezkl release whose aggregate() takes different arguments;
+            # aggregation errors proper are raised, not masked by a fallback.
+            log.warning("ezkl.aggregate signature not supported; falling back", exc_info=True)
     if shutil.which("ezkl"):
         try:
             cmd = ["ezkl", "aggregate"]
@@ -62,9 +146,20 @@ def aggregate_proofs(chunk_proofs: List[str], out_proof: str) -> str:
             return out_proof
         except Exception:
             pass
-    h = hashlib.sha256()
+    # A proof listed more than once (padding, replayed shards, hard links)
+    # is hashed once: paths are grouped by the file they resolve to.
+    keys = []
     for p in chunk_proofs:
-        h.update(open(p, "rb").read())
+        st = os.stat(p)
+        keys.append((st.st_dev, st.st_ino))
+    unique = list(dict(zip(keys, chunk_proofs)).items())
+    leaf = lambda item: _proof_leaf(item[1], tree_hash)
+    if len(unique) > 1:
+        with ThreadPoolExecutor(max_workers=min(len(unique), os.cpu_count() or 1)) as ex:
+            digests = dict(zip((k for k, _ in unique), ex.map(leaf, unique)))
+    else:
+        digests = {k: leaf((k, p)) for k, p in unique}
+    leaves = [digests[k] for k in keys]
     with open(out_proof, "wb") as f:
-        f.write(h.hexdigest().encode())
+        f.write(compute_merkle_root(leaves, tree_hash=tree_hash).encode())
     return out_proof
@@ -1,6 +1,9 @@
+import os, json, hashlib, inspect
 import torch
 import torch.nn as nn
 
+OPSET = 17
+
 class SGDStep(nn.Module):
     """PyTorch module representing a single SGD optimization step.
 
@@ -24,7 +27,21 @@ class AdamStep(nn.Module):
 
     This module is intended to be exported to ONNX for ZK proof generation.
     It implements the standard Adam update rule.
+
+    If `beta1`/`beta2` are given, they are baked into the module: the
+    `1 - beta` terms become ONNX constants instead of subtraction nodes, and
+    the corresponding forward arguments are ignored.
     """
+    def __init__(self, beta1: float | None = None, beta2: float | None = None):
+        """Initializes the AdamStep module.
+
+        Args:
+            beta1: Optional fixed first-moment decay rate.
+            beta2: Optional fixed second-moment decay rate.
+        """
+        super().__init__()
+        self.betas = None if beta1 is None or beta2 is None else (beta1, beta2)
+
     def forward(self, w_flat, g_flat, m_flat, v_flat, lr, beta1, beta2, eps, t):
         """Performs the Adam update.
 
@@ -45,16 +62,58 @@ class AdamStep(nn.Module):
             - m_next: Updated first moment vector.
             - v_next: Updated second moment vector.
         """
-        # Adam update in torch form (fixed-point handled outside circuit)
-        m_next = beta1 * m_flat + (1.0 - beta1) * g_flat
-        v_next = beta2 * v_flat + (1.0 - beta2) * (g_flat * g_flat)
-        m_hat = m_next / (1.0 - beta1 ** t)
-        v_hat = v_next / (1.0 - beta2 ** t)
+        # Adam update in torch form (fixed-point handled outside circuit).
+        # Bias corrections are scalars: invert them once and scale each
+        # element by a multiply rather than dividing every element.
+        if self.betas is not None:
+            beta1, beta2 = self.betas
+        inv_bc1 = 1.0 / (1.0 - beta1 ** t)
+        inv_bc2 = 1.0 / (1.0 - beta2 ** t)
+        if not torch.onnx.is_in_onnx_export():
+            # Eager: lerp/addcdiv are single fused kernels. They are not used
+            # when exporting, because ONNX lowers lerp to a Where over two
+            # branches, which would add gates to the circuit.
+            m_next = torch.lerp(g_flat, m_flat, beta1)
+            v_next = torch.lerp(g_flat * g_flat, v_flat, beta2)
+            denom = torch.sqrt(v_next * inv_bc2) + eps
+            w_next = torch.addcdiv(w_flat, m_next * inv_bc1, denom, value=-float(lr))
+            return w_next, m_next, v_next
+        one_minus_b1, one_minus_b2 = 1.0 - beta1, 1.0 - beta2
+        m_next = beta1 * m_flat + one_minus_b1 * g_flat
+        v_next = beta2 * v_flat + one_minus_b2 * (g_flat * g_flat)
+        m_hat = m_next * inv_bc1
+        v_hat = v_next * inv_bc2
         w_next = w_flat - lr * m_hat / (torch.sqrt(v_hat) + eps)
         return w_next, m_next, v_next
 
+def _export_once(mod, args, path, input_names, output_names):
+    """Runs `torch.onnx.export` unless `path` already holds the same export.
+
+    A `<path>.meta` sidecar records the module's source hash, baked betas,
+    input shapes and opset; if it matches and `path` exists, tracing is
+    skipped.
+    """
+    meta = {
+        "module": type(mod).__name__,
+        "source": hashlib.sha256(inspect.getsource(type(mod)).encode()).hexdigest(),
+        "betas": list(getattr(mod, "betas", None) or []),
+        "shapes": [list(a.shape) for a in args],
+        "opset": OPSET,
+    }
+    meta_path = path + ".meta"
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            if os.path.exists(path) and json.load(f) == meta:
+                return
+    except (OSError, ValueError):
+        pass
+    torch.onnx.export(mod, args, path, input_names=input_names,
+                      output_names=output_names, opset_version=OPSET)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
 def export_sgd_onnx(path="artifacts/sgd_step.onnx", dim=128):
-    """Exports the SGDStep module to an ONNX file.
+    """Exports the SGDStep module to an ONNX file, unless already exported.
 
     Args:
         path: The output path for the ONNX file.
@@ -64,19 +123,21 @@ def export_sgd_onnx(path="artifacts/sgd_step.onnx", dim=128):
     w = torch.randn(dim)
     g = torch.randn(dim)
     lr = torch.tensor(1e-2)
-    torch.onnx.export(mod, (w, g, lr), path,
-                      input_names=["w_flat", "g_flat", "lr"],
-                      output_names=["w_next"],
-                      opset_version=17)
+    _export_once(mod, (w, g, lr), path,
+                 input_names=["w_flat", "g_flat", "lr"],
+                 output_names=["w_next"])
 
-def export_adam_onnx(path="artifacts/adam_step.onnx", dim=128):
-    """Exports the AdamStep module to an ONNX file.
+def export_adam_onnx(path="artifacts/adam_step.onnx", dim=128, betas=None):
+    """Exports the AdamStep module to an ONNX file, unless already exported.
 
     Args:
         path: The output path for the ONNX file.
         dim: The dimension of the weight/gradient vectors.
+        betas: Optional (beta1, beta2) to bake into the circuit as constants.
+            The `beta1`/`beta2` inputs are then kept for input compatibility
+            but do not affect the output.
     """
-    mod = AdamStep().eval()
+    mod = AdamStep(*(betas or (None, None))).eval()
     w = torch.randn(dim)
     g = torch.randn(dim)
     m = torch.zeros(dim)
@@ -86,8 +147,7 @@ def export_adam_onnx(path="artifacts/adam_step.onnx", dim=128):
     beta2 = torch.tensor(0.999)
     eps = torch.tensor(1e-8)
     t = torch.tensor(1.0)
-    torch.onnx.export(mod, (w, g, m, v, lr, beta1, beta2, eps, t), path,
-                      input_names=["w_flat", "g_flat", "m_flat", "v_flat",
-                                   "lr","beta1","beta2","eps","t"],
-                      output_names=["w_next","m_next","v_next"],
-                      opset_version=17)
+    _export_once(mod, (w, g, m, v, lr, beta1, beta2, eps, t), path,
+                 input_names=["w_flat", "g_flat", "m_flat", "v_flat",
+                              "lr","beta1","beta2","eps","t"],
+                 output_names=["w_next","m_next","v_next"])
@@ -3,50 +3,133 @@ Toy torrent creator for PoC.
 
 In production, use a real torrent library and private tracker policies.
 """
-import os, json, hashlib, base64
+import os, json, mmap, hashlib, base64, tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+HASH_BLOCK = 4 << 20
+# Files at least this large are hashed from a read-only mmap in one update.
+MMAP_MIN_BYTES = 100 << 20
 
 def file_hash(path: str) -> str:
     """Computes the SHA256 hash of a file.
 
+    Large files are hashed from an mmap in a single call. Otherwise uses
+    `hashlib.file_digest` on Python 3.11+; older versions read 4 MiB blocks
+    into one reused buffer. The GIL is released while hashing either way.
+
+    Args:
+        path: The path to the file.
+
+    Returns:
+        The hexadecimal representation of the SHA256 hash.
+    """
+    with open(path, "rb", buffering=0) as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_MIN_BYTES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return hashlib.sha256(mm).hexdigest()
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        h = hashlib.sha256()
+        mv = memoryview(bytearray(HASH_BLOCK))
+        while n := f.readinto(mv):
+            h.update(mv[:n])
+        return h.hexdigest()
+
+def cached_file_hash(path: str, cache_dir: Optional[str] = None) -> str:
+    """Computes the SHA256 hash of a file, reusing a record in `cache_dir`.
+
+    Records live outside the hashed tree, one per file, named by the SHA256
+    of the file's real path. Each holds `"<hex> <size> <mtime_ns> <inode>"`
+    and is trusted only while the file's stat still matches; otherwise the
+    file is rehashed and the record rewritten through a private temp file.
+    Records that cannot be written are skipped, and no `cache_dir` disables
+    caching.
+
     Args:
         path: The path to the file.
+        cache_dir: Directory holding the hash records.
 
     Returns:
         The hexadecimal representation of the SHA256 hash.
     """
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(1<<20), b""):
-            h.update(chunk)
+    if not cache_dir:
+        return file_hash(path)
+    st = os.stat(path)
+    stamp = f"{st.st_size} {st.st_mtime_ns} {st.st_ino}"
+    record = os.path.join(cache_dir, hashlib.sha256(os.path.realpath(path).encode()).hexdigest())
+    try:
+        with open(record, encoding="ascii") as f:
+            digest, _, cached = f.read().strip().partition(" ")
+        if cached == stamp:
+            return digest
+    except OSError:
+        pass
+    digest = file_hash(path)
+    try:
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="ascii") as f:
+                f.write(f"{digest} {stamp}\n")
+            os.replace(tmp, record)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        pass
+    return digest
+
+def _info_hash(info: Dict) -> str:
+    """Hashes `json.dumps(info, sort_keys=True)` one file entry at a time.
+
+    The bytes fed to SHA-256 are identical to the one-shot serialization, so
+    infohashes are unchanged, but the full JSON text is never built.
+    """
+    h = hashlib.sha256(b'{"files": [')
+    update, dumps = h.update, json.dumps
+    for i, entry in enumerate(info["files"]):
+        if i:
+            update(b", ")
+        update(dumps(entry, sort_keys=True).encode())
+    h.update(b'], "name": ' + json.dumps(info["name"]).encode() + b"}")
     return h.hexdigest()
 
-def create_toy_torrent_bundle(run_dir: str, out_dir: str) -> Dict:
+def create_toy_torrent_bundle(run_dir: str, out_dir: str, hash_cache: Optional[str] = None) -> Dict:
     """Creates a 'toy' torrent manifest for a run directory.
 
     This function generates a JSON manifest listing all files in the run directory
-    along with their SHA256 hashes. It also generates a magnet link based on
+    along with their SHA256 hashes, which are computed in parallel and, if
+    `hash_cache` is given, cached there for later bundles. It also generates a magnet link based on
     the hash of this manifest.
 
     Args:
         run_dir: The directory containing the run artifacts.
         out_dir: The directory where the torrent manifest will be saved.
+        hash_cache: Optional directory for hash records; keep it outside
+            any published tree. Without one, every file is hashed.
 
     Returns:
         A dictionary containing the torrent manifest information, including
         the infohash, magnet link, and file list.
     """
     Path(out_dir).mkdir(parents=True, exist_ok=True)
-    files = []
-    for root, _, names in os.walk(run_dir):
-        for n in names:
-            p = os.path.join(root, n)
-            rel = os.path.relpath(p, run_dir)
-            files.append({"path": rel, "sha256": file_hash(p)})
+    if hash_cache:
+        Path(hash_cache).mkdir(parents=True, exist_ok=True)
+    join, relpath, realpath = os.path.join, os.path.relpath, os.path.realpath
+    paths = []
+    for root, dirs, names in os.walk(run_dir):
+        # Only the cache itself is skipped, in case it sits under run_dir.
+        if hash_cache:
+            dirs[:] = [d for d in dirs if realpath(join(root, d)) != realpath(hash_cache)]
+        paths += [join(root, n) for n in names]
+    # Hashing releases the GIL, so files are hashed concurrently on threads.
+    with ThreadPoolExecutor(max_workers=min(32, os.cpu_count() or 1)) as ex:
+        hashes = list(ex.map(lambda p: cached_file_hash(p, hash_cache), paths))
+    files = [{"path": relpath(p, run_dir), "sha256": h} for p, h in zip(paths, hashes)]
 
     info = {"name": os.path.basename(run_dir), "files": files}
-    infohash = hashlib.sha256(json.dumps(info, sort_keys=True).encode()).hexdigest()
+    infohash = _info_hash(info)
 
     manifest = {
         "infohash": infohash,
@@ -1,4 +1,5 @@
 import os, time, argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import torch
 import torch.nn as nn
@@ -7,9 +8,9 @@ from tqdm import trange
 
 from zk_autograd.config import Tunables
 from zk_autograd.hooks import GradHookCollector
-from zk_autograd.quantize import flatten_params
+from zk_autograd.quantize import stack_params
 from zk_autograd.prover_client import ProverClient
-from zk_autograd.audit_log import LoggedStep, append_step, finalize_run
+from zk_autograd.audit_log import LoggedStep, StepLogger, finalize_run
 from zk_autograd.anchoring import get_anchor_store
 
 class TinyMLP(nn.Module):
@@ -23,23 +24,36 @@ class TinyMLP(nn.Module):
             nn.Linear(28*28, 64), nn.ReLU(),
             nn.Linear(64, 10)
         )
+        # Flattening order of the witness vectors, fixed once per model.
+        self._param_order = sorted(n for n, _ in self.named_parameters())
     def forward(self, x):
         """Forward pass of the network."""
         return self.net(x)
 
-def get_fake_data(batch_size=32):
+def get_fake_data(batch_size=32, out=None):
     """Generates fake random data for training.
 
     Args:
         batch_size: The number of samples in the batch.
+        out: Optional (x, y) tensors from a previous call to refill in place
+            instead of allocating a new batch.
 
     Returns:
         A tuple (x, y) containing random input tensors and integer labels.
     """
-    x = torch.randn(batch_size, 1, 28, 28)
-    y = torch.randint(0, 10, (batch_size,))
+    if out is None:
+        out = (torch.empty(batch_size, 1, 28, 28), torch.empty(batch_size, dtype=torch.long))
+    x, y = out
+    x.normal_()
+    y.random_(0, 10)
     return x, y
 
+def _persist_step(step_log: StepLogger, proof_path: str, proof_bytes: bytes, logged: LoggedStep):
+    """Writes a step's proof file and appends it to the step log."""
+    with open(proof_path, "wb") as f:
+        f.write(proof_bytes)
+    step_log.append(logged)
+
 def run_demo_train(steps=10, prover_url=None, tunables: Tunables = None):
     """Runs a demonstration training loop with ZK proof generation.
 
@@ -71,69 +85,82 @@ def run_demo_train(steps=10, prover_url=None, tunables: Tunables = None):
     run_dir = os.path.join(tunables.artifact_dir, f"run-{time.strftime('%Y%m%d-%H%M%S')}")
     proofs_dir = os.path.join(run_dir, "proofs")
     Path(proofs_dir).mkdir(parents=True, exist_ok=True)
-
-    for step_idx in trange(tunables.steps, desc="training"):
-        x, y = get_fake_data(tunables.batch_size)
-        opt.zero_grad()
-        logits = model(x.view(x.size(0), -1))
-        loss = loss_fn(logits, y)
-        loss.backward()
-
-        witness = hooks.snapshot(lr=tunables.lr, step_idx=step_idx)
-
-        # pull Adam state from optimizer
-        m_state, v_state = {}, {}
-        for n, p in model.named_parameters():
-            st = opt.state[p]
-            if "exp_avg" in st:
-                m_state[n] = st["exp_avg"].detach().cpu()
-                v_state[n] = st["exp_avg_sq"].detach().cpu()
-            else:
-                m_state[n] = torch.zeros_like(p.detach().cpu())
-                v_state[n] = torch.zeros_like(p.detach().cpu())
-
-        w_flat_q = flatten_params(witness.weights, tunables.scale)
-        g_flat_q = flatten_params(witness.grads, tunables.scale)
-        m_flat_q = flatten_params(m_state, tunables.scale)
-        v_flat_q = flatten_params(v_state, tunables.scale)
-
-        payload = {
-            "w_flat": w_flat_q.tolist(),
-            "g_flat": g_flat_q.tolist(),
-            "m_flat": m_flat_q.tolist(),
-            "v_flat": v_flat_q.tolist(),
-            "lr": witness.lr,
-            "beta1": tunables.beta1,
-            "beta2": tunables.beta2,
-            "eps": tunables.eps,
-            "t": step_idx + 1,
-            "step_idx": step_idx,
-            "loss_meta": {"type": "cross_entropy", "value": float(loss.item())},
-            "scale": tunables.scale,
-            "circuit": "adam"
-        }
-
-        if step_idx % tunables.prove_every_n == 0:
-            resp = client.prove_step(payload)
-            proof_path = os.path.join(proofs_dir, f"step_{step_idx:06d}.proof")
-            with open(proof_path, "wb") as f:
-                f.write(resp["proof_bytes"])
-            logged = LoggedStep(
-                step_idx=step_idx,
-                proof_hash=resp["proof_hash"],
-                public_inputs=resp["public_inputs"],
-                timestamp=time.time()
-            )
-            append_step(run_dir, logged)
-
-        opt.step()
-
-    manifest = finalize_run(run_dir)
+    step_log = StepLogger(run_dir)
+    # Proof writes and log appends overlap the next steps. One worker keeps
+    # them in step order, since the StepLogger is not thread-safe.
+    io_pool = ThreadPoolExecutor(max_workers=1)
+    io_jobs = []
+
+    try:
+        batch = None
+        for step_idx in trange(tunables.steps, desc="training"):
+            # Refilled in place each step; backward() has released the last one.
+            batch = x, y = get_fake_data(tunables.batch_size, out=batch)
+            opt.zero_grad()
+            logits = model(x.view(x.size(0), -1))
+            loss = loss_fn(logits, y)
+            loss.backward()
+
+            if step_idx % tunables.prove_every_n == 0:
+                witness = hooks.snapshot(lr=tunables.lr, step_idx=step_idx)
+
+                # pull Adam state from optimizer; stack_params detaches and
+                # moves it to host in one transfer, so no per-tensor copies here
+                m_state, v_state = {}, {}
+                for n, p in model.named_parameters():
+                    st = opt.state[p]
+                    if "exp_avg" in st:
+                        m_state[n] = st["exp_avg"]
+                        v_state[n] = st["exp_avg_sq"]
+                    else:
+                        m_state[n] = torch.zeros_like(p)
+                        v_state[n] = torch.zeros_like(p)
+
+                # One (4, N) quantize and host transfer; the rows are contiguous views.
+                w_flat_q, g_flat_q, m_flat_q, v_flat_q = stack_params(
+                    (witness.weights, witness.grads, m_state, v_state), tunables.scale, model._param_order)
+
+                payload = {
+                    "w_flat": w_flat_q,
+                    "g_flat": g_flat_q,
+                    "m_flat": m_flat_q,
+                    "v_flat": v_flat_q,
+                    "lr": witness.lr,
+                    "beta1": tunables.beta1,
+                    "beta2": tunables.beta2,
+                    "eps": tunables.eps,
+                    "t": step_idx + 1,
+                    "step_idx": step_idx,
+                    "loss_meta": {"type": "cross_entropy", "value": float(loss.item())},
+                    "scale": tunables.scale,
+                    "circuit": "adam"
+                }
+
+                resp = client.prove_step(payload)
+                proof_path = os.path.join(proofs_dir, f"step_{step_idx:06d}.proof")
+                logged = LoggedStep(
+                    step_idx=step_idx,
+                    proof_hash=resp["proof_hash"],
+                    public_inputs=resp["public_inputs"],
+                    timestamp=time.time()
+                )
+                io_jobs.append(io_pool.submit(_persist_step, step_log, proof_path, resp["proof_bytes"], logged))
+
+            opt.step()
+    finally:
+        # Drain pending writes and close the log even if a step raised.
+        io_pool.shutdown(wait=True)
+        step_log.close()
+
+    for job in io_jobs:
+        job.result()
+    manifest = finalize_run(run_dir, logger=step_log, tree_hash=tunables.tree_hash)
 
     # Anchor merkle root with monotonic counter
     anchor = get_anchor_store(tunables.anchor_backend, path=os.path.join(run_dir,"anchors.json"))
     c = anchor.next_counter(manifest["run_dir"])
     anchor.anchor_root(manifest["run_dir"], c, manifest["merkle_root"], {"num_steps": manifest["num_steps"]})
+    anchor.flush()
 
     return run_dir
 
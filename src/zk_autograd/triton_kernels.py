@@ -1,47 +1,77 @@
 """triton_kernels.py
 
-Optional Triton fused Adam update with padding + reduced branching.
+Optional Triton fused Adam(W) update with masked tails + reduced branching.
 """
 from __future__ import annotations
+import functools
+import os
 import torch
 try:
     import triton, triton.language as tl
 except Exception:
     triton = None; tl = None
 
+@functools.lru_cache(maxsize=1)
 def available() -> bool:
     """Checks if Triton and CUDA are available.
 
+    The result is cached: `torch.cuda.is_available()` initialises the driver
+    on first use and `fused_adam_step` asks on every call. The cache is
+    cleared in forked children, which must probe CUDA for themselves.
+
     Returns:
         True if both Triton is installed and CUDA is available, False otherwise.
     """
     return triton is not None and torch.cuda.is_available()
 
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=available.cache_clear)
+
 if triton is not None:
     @triton.jit
-    def adam_step_kernel(W, G, M, V, W_out, M_out, V_out, lr, b1, b2, eps, t,
-                         N: tl.constexpr, BLOCK: tl.constexpr):
+    def _adam_block(W, G, M, V, W_out, M_out, V_out, lr, b1, b2, eps, wd, clip_coef,
+                    inv_bc1, inv_bc2, N, BLOCK: tl.constexpr):
         pid = tl.program_id(0)
         offs = pid * BLOCK + tl.arange(0, BLOCK)
         mask = offs < N
         w = tl.load(W + offs, mask=mask, other=0.0)
-        g = tl.load(G + offs, mask=mask, other=0.0)
+        g = tl.load(G + offs, mask=mask, other=0.0) * clip_coef
         m = tl.load(M + offs, mask=mask, other=0.0)
         v = tl.load(V + offs, mask=mask, other=0.0)
         m_next = b1 * m + (1.0 - b1) * g
         v_next = b2 * v + (1.0 - b2) * g * g
-        m_hat = m_next / (1.0 - b1 ** t)
-        v_hat = v_next / (1.0 - b2 ** t)
-        w_next = w - lr * m_hat / (tl.sqrt(v_hat) + eps)
+        m_hat = m_next * inv_bc1
+        v_hat = v_next * inv_bc2
+        w_next = w * (1.0 - lr * wd) - lr * m_hat / (tl.sqrt(v_hat) + eps)
         tl.store(W_out + offs, w_next, mask=mask)
         tl.store(M_out + offs, m_next, mask=mask)
         tl.store(V_out + offs, v_next, mask=mask)
 
-def fused_adam_step(w, g, m, v, lr, beta1, beta2, eps, t, block=1024):
-    """Performs a fused Adam update using a Triton kernel.
+    @triton.jit
+    def adam_step_kernel(W, G, M, V, W_out, M_out, V_out, lr, b1, b2, eps, wd, clip_coef,
+                         inv_bc1, inv_bc2, N, BLOCK: tl.constexpr):
+        _adam_block(W, G, M, V, W_out, M_out, V_out, lr, b1, b2, eps, wd, clip_coef,
+                    inv_bc1, inv_bc2, N, BLOCK)
+
+    @triton.jit
+    def adam_step_graph_kernel(W, G, M, V, S, b1, b2, eps, wd, clip_coef, N, BLOCK: tl.constexpr):
+        # lr and the bias corrections change every step, so a captured graph
+        # reads them from the device buffer S = [lr, inv_bc1, inv_bc2].
+        lr = tl.load(S)
+        inv_bc1 = tl.load(S + 1)
+        inv_bc2 = tl.load(S + 2)
+        _adam_block(W, G, M, V, W, M, V, lr, b1, b2, eps, wd, clip_coef,
+                    inv_bc1, inv_bc2, N, BLOCK)
+
+def fused_adam_step(w, g, m, v, lr, beta1, beta2, eps, t, wd=0.0, clip_coef=1.0, block=1024):
+    """Performs a fused Adam(W) update using a Triton kernel.
 
-    This function pads the input tensors to the nearest block size and invokes
-    the Triton kernel for efficient execution on GPU.
+    Gradient clipping, decoupled weight decay, both moment updates and the
+    parameter update happen in one kernel, so each of w/g/m/v is read once
+    and each output written once. The tensors are flattened and launched
+    with one program per block of elements; the last block is masked, so
+    no padding is needed. The bias corrections depend only on `t`, so their
+    reciprocals are computed once here and passed to the kernel as scalars.
 
     Args:
         w: Weight tensor.
@@ -53,19 +83,92 @@ def fused_adam_step(w, g, m, v, lr, beta1, beta2, eps, t, block=1024):
         beta2: Exponential decay rate for second moment.
         eps: Small constant for numerical stability.
         t: Time step.
+        wd: Decoupled weight decay; 0 gives plain Adam, matching `AdamStep`.
+        clip_coef: Scale applied to the gradient (e.g. from a global-norm clip).
         block: Block size for the Triton kernel.
 
     Returns:
-        A tuple (w_out, m_out, v_out) containing the updated tensors.
+        A tuple (w_out, m_out, v_out) containing the updated tensors, shaped like the inputs.
     """
     assert available(), "Triton/CUDA not available."
+    shape = w.shape
+    w, g, m, v = (x.contiguous().view(-1) for x in (w, g, m, v))
     N = w.numel()
-    padN = ((N + block - 1)//block)*block
-    def pad(x):
-        if x.numel()==padN: return x
-        y = torch.zeros(padN, device=x.device, dtype=x.dtype); y[:x.numel()] = x; return y
-    w_p,g_p,m_p,v_p = map(pad, (w,g,m,v))
-    w_out,m_out,v_out = (torch.empty_like(w_p), torch.empty_like(m_p), torch.empty_like(v_p))
-    grid=(padN//block,)
-    adam_step_kernel[grid](w_p,g_p,m_p,v_p,w_out,m_out,v_out, lr,beta1,beta2,eps,float(t), N=padN, BLOCK=block)
-    return w_out[:N], m_out[:N], v_out[:N]
+    w_out, m_out, v_out = torch.empty_like(w), torch.empty_like(m), torch.empty_like(v)
+    inv_bc1 = 1.0 / (1.0 - float(beta1) ** float(t))
+    inv_bc2 = 1.0 / (1.0 - float(beta2) ** float(t))
+    grid = (triton.cdiv(N, block),)
+    adam_step_kernel[grid](w, g, m, v, w_out, m_out, v_out, lr, beta1, beta2, eps, wd, clip_coef,
+                           inv_bc1, inv_bc2, N=N, BLOCK=block, num_warps=4)
+    return w_out.view(shape), m_out.view(shape), v_out.view(shape)
+
+class GraphedAdam:
+    """Replays a captured Adam(W) update for fixed-shape training loops.
+
+    `capture` launches `adam_step_graph_kernel` once to compile it, then
+    records the launch into a `torch.cuda.CUDAGraph`; each `step` is a single
+    `replay()`. The update is in place on the captured `w`, `m` and `v`, and
+    the captured tensors must stay the same objects: write the next gradient
+    into `g` (e.g. `g.copy_(...)`) rather than rebinding it. The learning rate
+    and bias corrections live in a small device buffer refreshed before each
+    replay.
+    """
+    def __init__(self, beta1, beta2, eps, wd=0.0, clip_coef=1.0, block=1024):
+        """Initializes the GraphedAdam.
+
+        Args:
+            beta1: Exponential decay rate for first moment.
+            beta2: Exponential decay rate for second moment.
+            eps: Small constant for numerical stability.
+            wd: Decoupled weight decay.
+            clip_coef: Scale applied to the gradient.
+            block: Block size for the Triton kernel.
+        """
+        self.beta1, self.beta2, self.eps = float(beta1), float(beta2), float(eps)
+        self.wd, self.clip_coef, self.block = float(wd), float(clip_coef), block
+        self.graph = None
+
+    def _scalars(self, lr, t):
+        inv_bc1 = 1.0 / (1.0 - self.beta1 ** float(t))
+        inv_bc2 = 1.0 / (1.0 - self.beta2 ** float(t))
+        return torch.tensor([float(lr), inv_bc1, inv_bc2], dtype=torch.float32)
+
+    def _launch(self):
+        adam_step_graph_kernel[(triton.cdiv(self.N, self.block),)](
+            self.w, self.g, self.m, self.v, self.S, self.beta1, self.beta2, self.eps,
+            self.wd, self.clip_coef, N=self.N, BLOCK=self.block, num_warps=4)
+
+    def capture(self, w, g, m, v, lr, t=1):
+        """Runs step `t` once, then captures the launch for later replays.
+
+        Args:
+            w: Weight tensor (contiguous, updated in place).
+            g: Gradient tensor (contiguous).
+            m: First moment tensor (contiguous, updated in place).
+            v: Second moment tensor (contiguous, updated in place).
+            lr: Learning rate for step `t`.
+            t: Time step of the warm-up update.
+        """
+        assert available(), "Triton/CUDA not available."
+        assert all(x.is_contiguous() for x in (w, g, m, v)), "GraphedAdam needs contiguous tensors."
+        self.w, self.g, self.m, self.v = w, g, m, v
+        self.N = w.numel()
+        self.S = self._scalars(lr, t).to(w.device)
+        with torch.no_grad():
+            # The warm-up launch compiles the kernel, so no compilation lands in the graph.
+            self._launch()
+            torch.cuda.synchronize()
+            self.graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(self.graph):
+                self._launch()
+
+    def step(self, lr, t):
+        """Applies step `t` to the captured tensors by replaying the graph.
+
+        Args:
+            lr: Learning rate.
+            t: Time step.
+        """
+        assert self.graph is not None, "call capture() first."
+        self.S.copy_(self._scalars(lr, t))
+        self.graph.replay()
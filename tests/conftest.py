@@ -7,6 +7,9 @@ import os
 import shutil
 import tempfile
 
+# tmpfs, when present, so fixture writes and cleanup never wait on a disk.
+SCRATCH_BASE = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
 @pytest.fixture
 def temp_run_dir():
     """Creates a temporary directory for a run and cleans it up afterwards.
@@ -14,6 +17,6 @@ def temp_run_dir():
     Yields:
         The path to the temporary directory.
     """
-    tmp_dir = tempfile.mkdtemp()
+    tmp_dir = tempfile.mkdtemp(dir=SCRATCH_BASE)
     yield tmp_dir
     shutil.rmtree(tmp_dir)
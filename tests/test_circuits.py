@@ -2,6 +2,7 @@ import pytest
 from unittest.mock import MagicMock, patch
 import sys
 import os
+import json
 
 # Mock ezkl if not installed or to avoid heavy lifting
 sys.modules["ezkl"] = MagicMock()
@@ -28,3 +29,155 @@ def test_export_adam_step_circuit(temp_run_dir):
         # Check that the first arg was the module
         args, _ = mock_export.call_args
         assert args[0].__class__.__name__ == "AdamStep"
+
+def test_export_adam_onnx_skips_unchanged_export(temp_run_dir):
+    onnx_path = os.path.join(temp_run_dir, "adam.onnx")
+    with patch("torch.onnx.export", side_effect=lambda *a, **k: open(a[2], "w").close()) as mock_export:
+        export_adam_onnx(onnx_path, dim=8)
+        export_adam_onnx(onnx_path, dim=8)
+        assert mock_export.call_count == 1
+        export_adam_onnx(onnx_path, dim=16)
+        export_adam_onnx(onnx_path, dim=16, betas=(0.9, 0.999))
+        assert mock_export.call_count == 3
+        os.remove(onnx_path)
+        export_adam_onnx(onnx_path, dim=16, betas=(0.9, 0.999))
+        assert mock_export.call_count == 4
+
+def test_adam_step_matches_torch_adam():
+    """AdamStep reproduces one torch.optim.Adam update at a later step."""
+    import torch
+    from zk_autograd.step_circuit import AdamStep
+    torch.manual_seed(0)
+    w = torch.randn(64)
+    p = torch.nn.Parameter(w.clone())
+    opt = torch.optim.Adam([p], lr=1e-2, betas=(0.9, 0.999), eps=1e-8)
+    for _ in range(3):
+        p.grad = torch.randn(64)
+        opt.step()
+    st = opt.state[p]
+    w, m, v = p.detach().clone(), st["exp_avg"].clone(), st["exp_avg_sq"].clone()
+    g = torch.randn(64)
+    p.grad = g.clone()
+    opt.step()
+    w_next, m_next, v_next = AdamStep()(w, g, m, v, torch.tensor(1e-2), torch.tensor(0.9),
+                                        torch.tensor(0.999), torch.tensor(1e-8), torch.tensor(4.0))
+    torch.testing.assert_close(m_next, st["exp_avg"])
+    torch.testing.assert_close(v_next, st["exp_avg_sq"])
+    torch.testing.assert_close(w_next, p.detach())
+
+def test_adam_step_baked_betas_ignore_inputs():
+    import torch
+    from zk_autograd.step_circuit import AdamStep
+    torch.manual_seed(0)
+    w, g, m, v = torch.randn(8), torch.randn(8), torch.randn(8), torch.rand(8)
+    scalars = (torch.tensor(1e-2), torch.tensor(0.9), torch.tensor(0.999), torch.tensor(1e-8), torch.tensor(2.0))
+    expected = AdamStep()(w, g, m, v, *scalars)
+    wrong_betas = (scalars[0], torch.tensor(0.5), torch.tensor(0.5), *scalars[3:])
+    for got, want in zip(AdamStep(0.9, 0.999)(w, g, m, v, *wrong_betas), expected):
+        torch.testing.assert_close(got, want)
+
+def test_adam_step_eager_and_export_forms_agree():
+    """The fused eager path and the arithmetic form traced for ONNX match."""
+    import torch
+    from zk_autograd.step_circuit import AdamStep
+    torch.manual_seed(0)
+    args = (torch.randn(32), torch.randn(32), torch.randn(32), torch.rand(32), torch.tensor(1e-2),
+            torch.tensor(0.9), torch.tensor(0.999), torch.tensor(1e-8), torch.tensor(3.0))
+    for mod in (AdamStep(), AdamStep(0.9, 0.999)):
+        eager = mod(*args)
+        with patch("torch.onnx.is_in_onnx_export", return_value=True):
+            traced_form = mod(*args)
+        for a, b in zip(eager, traced_form):
+            torch.testing.assert_close(a, b)
+
+def _writes(*keys):
+    """Side effect for a mocked EZKL call: create the files named by `keys`."""
+    def fn(**kwargs):
+        for key in keys:
+            with open(kwargs[key], "w") as f:
+                f.write(key)
+    return fn
+
+def test_ensure_setup_skips_fresh_stages(temp_run_dir):
+    """Verifies a second ensure_setup run reuses artifacts recorded in the manifest."""
+    from zk_autograd import ezkl_setup
+
+    def export(path, dim):
+        # Like _export_once: rewrite only when the .meta sidecar is missing.
+        if not os.path.exists(path + ".meta"):
+            exports.append(path)
+            with open(path, "w") as f:
+                f.write(str(dim))
+            open(path + ".meta", "w").close()
+    exports = []
+
+    with patch.object(ezkl_setup, "ezkl") as mock_ezkl, \
+         patch.object(ezkl_setup, "export_adam_onnx", side_effect=export) as mock_export:
+        mock_ezkl.gen_settings.side_effect = _writes("output")
+        mock_ezkl.get_srs.side_effect = _writes("srs_path")
+        mock_ezkl.compile_circuit.side_effect = _writes("compiled_circuit")
+        mock_ezkl.setup.side_effect = _writes("vk_path", "pk_path")
+        ezkl_setup.ensure_setup("adam", 8, temp_run_dir)
+        ezkl_setup.ensure_setup("adam", 8, temp_run_dir)
+        assert mock_export.call_count == 2 and len(exports) == 1
+        with open(os.path.join(temp_run_dir, ezkl_setup.MANIFEST)) as f:
+            assert json.load(f)["dim"] == 8
+        assert mock_ezkl.setup.call_count == 1
+
+        # Touching a middle artifact reruns it and everything after it.
+        with open(os.path.join(temp_run_dir, "compiled.ezkl"), "w") as f:
+            f.write("changed")
+        ezkl_setup.ensure_setup("adam", 8, temp_run_dir)
+        assert mock_ezkl.get_srs.call_count == 1
+        assert mock_ezkl.compile_circuit.call_count == 2
+        assert mock_ezkl.setup.call_count == 2
+
+        ezkl_setup.ensure_setup("adam", 8, temp_run_dir, force=True)
+        assert len(exports) == 2
+
+def test_ensure_setup_regenerates_keys_when_step_source_changes(temp_run_dir):
+    """Verifies editing the step module re-exports the ONNX and regenerates the keys."""
+    import inspect
+    from zk_autograd import ezkl_setup, step_circuit
+    real_source = inspect.getsource
+
+    def export(mod, args, path, **kwargs):
+        with open(path, "a") as f:
+            f.write("x")
+
+    with patch.object(ezkl_setup, "ezkl") as mock_ezkl, patch("torch.onnx.export", side_effect=export):
+        mock_ezkl.gen_settings.side_effect = _writes("output")
+        mock_ezkl.get_srs.side_effect = _writes("srs_path")
+        mock_ezkl.compile_circuit.side_effect = _writes("compiled_circuit")
+        mock_ezkl.setup.side_effect = _writes("vk_path", "pk_path")
+        ezkl_setup.ensure_setup("adam", 8, temp_run_dir)
+        ezkl_setup.ensure_setup("adam", 8, temp_run_dir)
+        assert mock_ezkl.setup.call_count == 1
+
+        edited = lambda obj: real_source(obj) + ("\n# edited" if obj is step_circuit.AdamStep else "")
+        with patch.object(step_circuit.inspect, "getsource", side_effect=edited):
+            ezkl_setup.ensure_setup("adam", 8, temp_run_dir)
+        assert mock_ezkl.gen_settings.call_count == 2
+        assert mock_ezkl.compile_circuit.call_count == 2
+        assert mock_ezkl.setup.call_count == 2
+
+def test_ensure_setup_fetches_srs_off_main_thread(temp_run_dir):
+    """Verifies the SRS fetch overlaps compilation on a background thread."""
+    import threading
+    from zk_autograd import ezkl_setup
+    srs_threads = []
+
+    def get_srs(**kwargs):
+        srs_threads.append(threading.get_ident())
+        _writes("srs_path")(**kwargs)
+
+    with patch.object(ezkl_setup, "ezkl") as mock_ezkl, \
+         patch.object(ezkl_setup, "export_adam_onnx", side_effect=lambda path, dim: open(path, "w").close()):
+        mock_ezkl.gen_settings.side_effect = _writes("output")
+        mock_ezkl.get_srs.side_effect = get_srs
+        mock_ezkl.compile_circuit.side_effect = _writes("compiled_circuit")
+        mock_ezkl.setup.side_effect = _writes("vk_path", "pk_path")
+        ezkl_setup.ensure_setup("adam", 8, temp_run_dir)
+
+    assert srs_threads and srs_threads[0] != threading.get_ident()
+    assert mock_ezkl.setup.call_count == 1
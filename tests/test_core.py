@@ -1,8 +1,11 @@
 import os
 import json
 import pytest
-from zk_autograd.audit_log import LoggedStep, RunLog, append_step, load_log, compute_merkle_root, finalize_run
-from zk_autograd.torrents import create_toy_torrent_bundle
+from unittest.mock import patch
+from zk_autograd import audit_log
+from zk_autograd.audit_log import LoggedStep, RunLog, append_step, load_log, compute_merkle_root, finalize_run, sha256_json
+from zk_autograd import torrents
+from zk_autograd.torrents import create_toy_torrent_bundle, file_hash
 
 def test_audit_log_lifecycle(temp_run_dir):
     """Verifies the full lifecycle of an audit log: append, load, finalize."""
@@ -65,3 +68,142 @@ def test_torrent_creation(temp_run_dir):
     # Verify file creation
     torrent_file = os.path.join(out_dir, f"{os.path.basename(temp_run_dir)}.toy.torrent.json")
     assert os.path.exists(torrent_file)
+
+def test_step_logger_buffers_until_finalize(temp_run_dir):
+    """Verifies StepLogger buffers steps and finalize_run flushes them before reading."""
+    from zk_autograd.audit_log import StepLogger
+    logger = StepLogger(temp_run_dir)
+    for i in range(3):
+        logger.append(LoggedStep(step_idx=i, proof_hash=f"{i:02x}" * 32, public_inputs={"i": i}, timestamp=float(i)))
+    
+    manifest = finalize_run(temp_run_dir, logger=logger)
+    assert manifest["num_steps"] == 3
+    log = load_log(temp_run_dir)
+    assert [s.step_idx for s in log.steps] == [0, 1, 2]
+    assert log.steps[2].public_inputs == {"i": 2}
+
+def test_sha256_json_digest_is_pinned():
+    """The canonical form is `json.dumps(sort_keys=True)`; existing digests must not move."""
+    obj = {"b": [1, 2.5, None, True], "a": {"z": "é", "y": -3}, "c": "x"}
+    reordered = {"c": "x", "a": {"y": -3, "z": "é"}, "b": [1, 2.5, None, True]}
+    digest = "c122605fb7f2e1c8803e6f6f0719e10675566026ccef1d0cfcc67a7e0c6fc7fe"
+    assert sha256_json(obj) == sha256_json(reordered) == digest
+    with patch.object(audit_log, "orjson", None):
+        assert sha256_json(obj) == digest
+
+@pytest.mark.parametrize("obj, canonical", [
+    ({"b": 1e-7, "c": 1e20, "a": 0.1}, '{"a": 0.1, "b": 1e-07, "c": 1e+20}'),
+    ({10: 2, 2: 1}, '{"2": 1, "10": 2}'),
+])
+def test_sha256_json_floats_and_int_keys(obj, canonical):
+    """Floats and non-string keys, where orjson and json.dumps disagree, use the json.dumps form."""
+    assert sha256_json(obj) == audit_log.sha256_bytes(canonical.encode())
+
+@pytest.mark.parametrize("use_file_digest", [True, False])
+def test_file_hash_matches_sha256(temp_run_dir, monkeypatch, use_file_digest):
+    import hashlib
+    if use_file_digest and not hasattr(hashlib, "file_digest"):
+        pytest.skip("hashlib.file_digest needs Python 3.11+")
+    if not use_file_digest:
+        monkeypatch.delattr(hashlib, "file_digest", raising=False)
+    data = os.urandom((9 << 20) + 7)
+    p = os.path.join(temp_run_dir, "artifact.bin")
+    with open(p, "wb") as f:
+        f.write(data)
+    assert file_hash(p) == hashlib.sha256(data).hexdigest()
+    monkeypatch.setattr(torrents, "MMAP_MIN_BYTES", 1 << 20)
+    assert file_hash(p) == hashlib.sha256(data).hexdigest()
+
+def test_torrent_bundle_lists_files_in_walk_order(temp_run_dir):
+    import hashlib
+    run_dir = os.path.join(temp_run_dir, "run")
+    os.makedirs(os.path.join(run_dir, "proofs"))
+    expected = []
+    for i in range(20):
+        rel = os.path.join("proofs", f"step_{i:06d}.proof")
+        with open(os.path.join(run_dir, rel), "wb") as f:
+            f.write(b"proof-%d" % i)
+    for root, _, names in os.walk(run_dir):
+        for n in names:
+            with open(os.path.join(root, n), "rb") as f:
+                expected.append({"path": os.path.relpath(os.path.join(root, n), run_dir),
+                                 "sha256": hashlib.sha256(f.read()).hexdigest()})
+    manifest = create_toy_torrent_bundle(run_dir, os.path.join(temp_run_dir, "torrents"))
+    assert manifest["files"] == expected
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_append_step_roundtrip(temp_run_dir, use_orjson):
+    if use_orjson and audit_log.orjson is None:
+        pytest.skip("orjson not installed")
+    steps = [LoggedStep(step_idx=i, proof_hash=f"{i:064x}", public_inputs={"w": [i, -i], "é": 0.5},
+                        timestamp=1700000000.25 + i) for i in range(3)]
+    with patch.object(audit_log, "orjson", audit_log.orjson if use_orjson else None):
+        for s in steps:
+            append_step(temp_run_dir, s)
+        assert load_log(temp_run_dir).steps == steps
+    # Either encoder's output is readable by the other.
+    assert load_log(temp_run_dir).steps == steps
+
+def test_torrent_bundle_reuses_hash_cache(temp_run_dir, monkeypatch):
+    cache = os.path.join(temp_run_dir, "cache")
+    run_dir = os.path.join(temp_run_dir, "run")
+    os.makedirs(run_dir)
+    p = os.path.join(run_dir, "proof.pf")
+    with open(p, "wb") as f:
+        f.write(b"v1")
+    # A real artifact with the old sidecar suffix is still listed.
+    with open(os.path.join(run_dir, "weights.sha256"), "w") as f:
+        f.write("digest")
+    out_dir = os.path.join(temp_run_dir, "torrents")
+    assert create_toy_torrent_bundle(run_dir, out_dir)["files"]
+    assert not os.path.exists(cache)
+    first = create_toy_torrent_bundle(run_dir, out_dir, hash_cache=cache)
+    assert sorted(os.listdir(run_dir)) == ["proof.pf", "weights.sha256"]
+    assert len(os.listdir(cache)) == 2
+    assert sorted(f["path"] for f in first["files"]) == ["proof.pf", "weights.sha256"]
+
+    hashed = []
+    real = torrents.file_hash
+    monkeypatch.setattr(torrents, "file_hash", lambda path: hashed.append(path) or real(path))
+    assert create_toy_torrent_bundle(run_dir, out_dir, hash_cache=cache) == first
+    assert hashed == []
+
+    with open(p, "wb") as f:
+        f.write(b"version 2")
+    third = create_toy_torrent_bundle(run_dir, out_dir, hash_cache=cache)
+    assert hashed == [p]
+    assert third["files"] != first["files"]
+
+def test_torrent_bundle_skips_nested_hash_cache(temp_run_dir):
+    run_dir = os.path.join(temp_run_dir, "run")
+    os.makedirs(run_dir)
+    with open(os.path.join(run_dir, "proof.pf"), "wb") as f:
+        f.write(b"v1")
+    cache = os.path.join(run_dir, "cache")
+    first = create_toy_torrent_bundle(run_dir, os.path.join(temp_run_dir, "torrents"), hash_cache=cache)
+    again = create_toy_torrent_bundle(run_dir, os.path.join(temp_run_dir, "torrents"), hash_cache=cache)
+    assert [f["path"] for f in first["files"]] == [f["path"] for f in again["files"]] == ["proof.pf"]
+    assert os.listdir(cache)
+
+def test_cached_file_hash_concurrent_writers_share_a_record(temp_run_dir):
+    """Threads hashing one file under different names each write a private temp record."""
+    from concurrent.futures import ThreadPoolExecutor
+    p = os.path.join(temp_run_dir, "proof.pf")
+    with open(p, "wb") as f:
+        f.write(b"v1")
+    link = os.path.join(temp_run_dir, "link.pf")
+    os.symlink(p, link)
+    cache = os.path.join(temp_run_dir, "cache")
+    os.makedirs(cache)
+    with ThreadPoolExecutor(8) as ex:
+        digests = set(ex.map(lambda q: torrents.cached_file_hash(q, cache), [p, link] * 32))
+    assert digests == {file_hash(p)}
+    assert len(os.listdir(cache)) == 1
+
+def test_info_hash_matches_one_shot_json():
+    import hashlib
+    for files in ([], [{"path": "a", "sha256": "00"}],
+                  [{"path": f"proofs/step_{i:06d}.proof", "sha256": f"{i:064x}"} for i in range(50)]):
+        info = {"name": "run-é", "files": files}
+        expected = hashlib.sha256(json.dumps(info, sort_keys=True).encode()).hexdigest()
+        assert torrents._info_hash(info) == expected
@@ -45,3 +45,63 @@ def test_finalize_empty_run(temp_run_dir):
     assert manifest["num_steps"] == 0
     # Merkle root of empty list is defined as sha256("") in the code
     assert manifest["merkle_root"] == "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"
+
+def test_merkle_root_native_kernel_matches_python():
+    """Verifies the Numba Merkle kernel agrees with the pure-Python path."""
+    from zk_autograd import merkle_kernels
+    if not merkle_kernels.available():
+        pytest.skip("numba not installed")
+    import hashlib
+    for n in (1, 2, 3, 7, 64, 101):
+        hashes = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+        native = merkle_kernels.merkle_root(bytes.fromhex("".join(hashes))).hex()
+        assert native == compute_merkle_root(hashes)
+
+def test_merkle_root_blake3_tree_hash(temp_run_dir):
+    import hashlib
+    from types import SimpleNamespace
+    from unittest.mock import patch
+    import pytest
+    from zk_autograd import audit_log
+    leaves = [hashlib.sha256(bytes([i])).hexdigest() for i in range(3)]
+    with patch.object(audit_log, "blake3", None):
+        with pytest.raises(RuntimeError, match="blake3"):
+            compute_merkle_root(leaves, tree_hash="blake3")
+    with pytest.raises(ValueError, match="unknown tree_hash"):
+        compute_merkle_root(leaves, tree_hash="md5")
+
+    # Stand in BLAKE2s for BLAKE3 so the tree shape is checked without the package.
+    with patch.object(audit_log, "blake3", SimpleNamespace(blake3=hashlib.blake2s)):
+        node = lambda b: hashlib.blake2s(b).digest()
+        l = [bytes.fromhex(h) for h in leaves]
+        expected = node(node(l[0] + l[1]) + node(l[2] + l[2])).hex()
+        assert compute_merkle_root(leaves, tree_hash="blake3") == expected
+        assert compute_merkle_root(["aaaa", "bbbb"], tree_hash="blake3") == node(bytes.fromhex("aaaabbbb")).hex()
+        for i, h in enumerate(leaves):
+            append_step(temp_run_dir, LoggedStep(step_idx=i, proof_hash=h, public_inputs={}, timestamp=0.0))
+        manifest = finalize_run(temp_run_dir, tree_hash="blake3")
+    assert manifest["tree_hash"] == "blake3"
+    assert manifest["merkle_root"] == expected
+    assert manifest["merkle_root"] != compute_merkle_root(leaves)
+
+def test_train_failure_closes_step_log(temp_run_dir):
+    """A failing step still drains the I/O pool and closes the step log."""
+    from unittest.mock import patch
+    from zk_autograd import trainer
+    from zk_autograd.config import Tunables
+
+    resp = {"proof_hash": "aa" * 32, "public_inputs": {}, "proof_bytes": b"proof"}
+    loggers = []
+    real_logger = trainer.StepLogger
+    def make_logger(run_dir):
+        loggers.append(real_logger(run_dir))
+        return loggers[-1]
+
+    with patch.object(trainer.ProverClient, "prove_step", side_effect=[resp, RuntimeError("prover down")]), \
+         patch.object(trainer, "StepLogger", side_effect=make_logger):
+        with pytest.raises(RuntimeError, match="prover down"):
+            trainer.run_demo_train(tunables=Tunables(steps=3, artifact_dir=temp_run_dir))
+
+    assert loggers[0]._f.closed
+    steps = load_log(os.path.dirname(loggers[0]._f.name)).steps
+    assert [s.step_idx for s in steps] == [0]
@@ -0,0 +1,288 @@
+"""test_ezkl_runner.py
+
+Unit tests for the EZKL prover wrapper (EZKL calls are mocked).
+"""
+import os
+import pytest
+from unittest.mock import patch
+
+from prover.ezkl_runner import EzklProver
+
+ARTIFACTS = ["settings.json", "compiled.ezkl", "pk.key", "vk.key", "kzg.srs"]
+
+@pytest.fixture
+def key_dir(temp_run_dir):
+    for name in ARTIFACTS:
+        with open(os.path.join(temp_run_dir, name), "wb") as f:
+            f.write(b"dummy")
+    return temp_run_dir
+
+def _payload(n=10):
+    return {
+        "w_flat": list(range(n)),
+        "g_flat": list(range(n)),
+        "m_flat": [0]*n,
+        "v_flat": [0]*n,
+        "lr": 0.001,
+        "step_idx": 7,
+    }
+
+def test_prove_step_chunks_keeps_chunk_order(key_dir):
+    """Chunk proofs come back in chunk order with correctly sliced inputs."""
+    prover = EzklProver(key_dir=key_dir, workers=1)
+    seen = []
+
+    def fake_prove_step(payload):
+        seen.append((payload["chunk_idx"], payload["w_flat"]))
+        return f"chunk_{payload['chunk_idx']}.pf", {}
+
+    with patch.object(prover, "prove_step", side_effect=fake_prove_step):
+        paths, pubs = prover.prove_step_chunks(_payload(10), chunks=3)
+
+    assert paths == ["chunk_0.pf", "chunk_1.pf", "chunk_2.pf"]
+    assert [list(w) for _, w in seen] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert pubs["chunks"] == 3
+
+def test_missing_artifacts_raise(temp_run_dir):
+    with pytest.raises(FileNotFoundError):
+        EzklProver(key_dir=temp_run_dir)
+
+def test_artifacts_are_mapped_and_released(key_dir):
+    prover = EzklProver(key_dir=key_dir, workers=1)
+    assert set(prover._mmaps) == {"pk", "srs", "compiled"}
+    assert prover._mmaps["pk"][:] == b"dummy"
+    prover.close()
+    assert prover._mmaps == {}
+
+def test_warmup_runs_once(key_dir, temp_run_dir):
+    prover = EzklProver(key_dir=key_dir, workers=1)
+    scratch = os.path.join(temp_run_dir, "scratch")
+    os.makedirs(scratch)
+    with patch.object(prover, "prove_step", return_value=(os.path.join(scratch, "proof.pf"), {})) as ps:
+        prover.warmup(dim=4)
+        prover.warmup(dim=4)
+    assert ps.call_count == 1
+    assert len(ps.call_args[0][0]["w_flat"]) == 4
+    assert prover.warm
+    assert not os.path.exists(scratch)
+
+def test_warmup_uses_circuit_dim_and_runs_once_across_threads(key_dir, temp_run_dir, monkeypatch):
+    """The manifest's dim sizes the payload; concurrent callers share one warm-up."""
+    import json
+    import threading
+    import time
+    monkeypatch.delenv("EZKL_WARMUP_DIM", raising=False)
+    with open(os.path.join(key_dir, "manifest.json"), "w") as f:
+        json.dump({"circuit": "adam", "dim": 6}, f)
+    prover = EzklProver(key_dir=key_dir, workers=1)
+    scratch = os.path.join(temp_run_dir, "scratch")
+
+    def slow_prove(payload):
+        time.sleep(0.05)
+        return os.path.join(scratch, "proof.pf"), {}
+
+    with patch.object(prover, "prove_step", side_effect=slow_prove) as ps:
+        threads = [threading.Thread(target=prover.warmup) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert ps.call_count == 1
+    assert len(ps.call_args[0][0]["w_flat"]) == 6
+
+def test_release_only_removes_prover_scratch(key_dir, temp_run_dir):
+    prover = EzklProver(key_dir=key_dir, workers=1)
+    scratch = os.path.join(temp_run_dir, "ezkl_step_abc")
+    other = os.path.join(temp_run_dir, "keep")
+    os.makedirs(scratch)
+    os.makedirs(other)
+    prover.release([os.path.join(scratch, "proof.pf"), os.path.join(other, "proof.pf")])
+    assert not os.path.exists(scratch)
+    assert os.path.exists(other)
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_write_input_json_accepts_arrays(key_dir, temp_run_dir, use_orjson):
+    import json
+    import numpy as np
+    import prover.ezkl_runner as runner
+    if use_orjson and runner.orjson is None:
+        pytest.skip("orjson not installed")
+    prover = EzklProver(key_dir=key_dir, workers=1)
+    payload = _payload(4)
+    payload["w_flat"] = np.arange(4, dtype=np.int64)[1:3]
+    path = os.path.join(temp_run_dir, "input.json")
+    with patch.object(runner, "orjson", runner.orjson if use_orjson else None):
+        prover._write_input_json(payload, path)
+    with open(path) as f:
+        data = json.load(f)["input_data"]
+    assert data[0] == [1, 2]
+    assert data[4] == [0.001]
+
+def test_aggregate_chunk_proofs_reduces_as_tree(key_dir, temp_run_dir):
+    prover = EzklProver(key_dir=key_dir, workers=1)
+    calls = []
+
+    def fake_aggregate(paths, out):
+        calls.append((list(paths), os.path.basename(out)))
+        return out
+
+    out_path = os.path.join(temp_run_dir, "aggregated.pf")
+    with patch("prover.ezkl_runner.ezkl_aggregation_available", return_value=False), \
+         patch("prover.ezkl_runner.aggregate_proofs", side_effect=fake_aggregate):
+        res = prover.aggregate_chunk_proofs(["p0", "p1", "p2", "p3", "p4"], out_path)
+
+    assert res == out_path
+    assert calls == [
+        (["p0", "p1"], "agg_0_0.pf"),
+        (["p2", "p3"], "agg_0_1.pf"),
+        ([os.path.join(temp_run_dir, "agg_0_0.pf"), os.path.join(temp_run_dir, "agg_0_1.pf")], "agg_1_0.pf"),
+        ([os.path.join(temp_run_dir, "agg_1_0.pf"), "p4"], "aggregated.pf"),
+    ]
+
+def test_aggregate_chunk_proofs_flat_with_ezkl(key_dir, temp_run_dir):
+    """Real EZKL aggregation takes every chunk proof in one call with the step vk."""
+    prover = EzklProver(key_dir=key_dir, workers=1)
+    out_path = os.path.join(temp_run_dir, "aggregated.pf")
+    with patch("prover.ezkl_runner.ezkl_aggregation_available", return_value=True) as avail, \
+         patch("prover.ezkl_runner.aggregate_proofs", return_value=out_path) as agg:
+        assert prover.aggregate_chunk_proofs(["p0", "p1", "p2", "p3", "p4"], out_path) == out_path
+    avail.assert_called_once_with(prover.vk, prover.srs)
+    agg.assert_called_once_with(["p0", "p1", "p2", "p3", "p4"], out_path,
+                                vk_path=prover.vk, srs_path=prover.srs)
+
+def test_witness_cache_skips_regeneration(key_dir, temp_run_dir):
+    import prover.ezkl_runner as runner
+    cache = os.path.join(temp_run_dir, "wit_cache")
+    prover = EzklProver(key_dir=key_dir, workers=1, witness_cache=cache)
+
+    def fake_gen_witness(data, model, output, vk_path, srs_path):
+        with open(output, "w") as f:
+            f.write("witness")
+
+    with patch("prover.ezkl_runner.ezkl") as mock_ezkl:
+        mock_ezkl.gen_witness.side_effect = fake_gen_witness
+        pf1, _ = prover.prove_step(_payload(4))
+        pf2, _ = prover.prove_step(dict(_payload(4), step_idx=8))
+        assert pf1.startswith(runner.SCRATCH_ROOT)
+        prover.release([pf1, pf2])
+        assert not os.path.exists(os.path.dirname(pf1))
+
+    assert mock_ezkl.gen_witness.call_count == 1
+    assert mock_ezkl.prove.call_count == 2
+    assert mock_ezkl.prove.call_args.kwargs["witness"].startswith(cache)
+    assert len(os.listdir(cache)) == 1
+
+def test_chunk_pool_spawns_lightweight_workers(key_dir):
+    """The pool uses the spawn start method and workers skip mapping and the cache sweep."""
+    import prover.ezkl_runner as runner
+    prover = EzklProver(key_dir=key_dir, workers=2)
+    with patch.object(runner, "ProcessPoolExecutor") as pool:
+        prover._executor()
+    kwargs = pool.call_args.kwargs
+    assert kwargs["mp_context"].get_start_method() == "spawn"
+    assert kwargs["initargs"] == (key_dir, "adam", prover.witness_cache)
+
+    with patch.object(EzklProver, "_warm_artifacts") as warm, \
+         patch.object(EzklProver, "_sweep_witness_cache") as sweep:
+        runner._init_worker(*kwargs["initargs"])
+    warm.assert_not_called()
+    sweep.assert_not_called()
+    assert runner._WORKER_PROVER.witness_cache == prover.witness_cache
+    assert runner._WORKER_PROVER._mmaps == {}
+
+def test_witness_key_tracks_circuit_content(key_dir, temp_run_dir):
+    """Regenerating settings or vk, not just compiled.ezkl, changes the witness key."""
+    prover = EzklProver(key_dir=key_dir, workers=1, witness_cache="")
+    inp = os.path.join(temp_run_dir, "input.json")
+    with open(inp, "w") as f:
+        f.write("{}")
+    k0 = prover._witness_key(inp)
+    assert prover._witness_key(inp) == k0
+    for name in ("settings.json", "vk.key"):
+        with open(os.path.join(key_dir, name), "wb") as f:
+            f.write(b"regenerated " + name.encode())
+        k1 = prover._witness_key(inp)
+        assert k1 != k0
+        k0 = k1
+
+def test_sweep_tolerates_concurrent_removal(key_dir, temp_run_dir):
+    """An entry deleted by another sweeper between scandir and stat is skipped."""
+    cache = os.path.join(temp_run_dir, "wit_cache")
+    prover = EzklProver(key_dir=key_dir, workers=1, witness_cache=cache)
+    for i in range(3):
+        open(os.path.join(cache, f"{i}.wit"), "w").close()
+    real_scandir = os.scandir
+
+    def racing_scandir(path):
+        entries = list(real_scandir(path))
+        os.remove(os.path.join(cache, "1.wit"))
+        return iter(entries)
+
+    with patch("prover.ezkl_runner.os.scandir", side_effect=racing_scandir):
+        prover._sweep_witness_cache(1)
+    assert len(os.listdir(cache)) == 1
+
+def test_scratch_falls_back_when_tmpfs_is_short(key_dir, temp_run_dir):
+    """Low free space, or ENOSPC mid-proof, moves the request to the regular temp dir."""
+    import errno
+    import tempfile
+    import prover.ezkl_runner as runner
+    shm = os.path.join(temp_run_dir, "shm")
+    tmp = os.path.join(temp_run_dir, "tmp")
+    os.makedirs(shm)
+    os.makedirs(tmp)
+    with patch.object(runner, "SCRATCH_ROOT", shm), \
+         patch.object(tempfile, "tempdir", tmp), \
+         patch.object(runner, "SCRATCH_MIN_FREE", 1 << 62):
+        assert runner._scratch_dir().startswith(tmp + os.sep)
+
+    prover = EzklProver(key_dir=key_dir, workers=1, witness_cache="")
+    calls = []
+
+    def fake_prove_in(d, payload):
+        calls.append(d)
+        if len(calls) == 1:
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return os.path.join(d, "proof.pf")
+
+    with patch.object(runner, "SCRATCH_ROOT", shm), \
+         patch.object(tempfile, "tempdir", tmp), \
+         patch.object(runner, "SCRATCH_MIN_FREE", 0), \
+         patch.object(prover, "_prove_in", side_effect=fake_prove_in):
+        pf, _ = prover.prove_step(_payload(4))
+    assert calls[0].startswith(shm + os.sep) and not os.path.exists(calls[0])
+    assert pf.startswith(tmp + os.sep)
+
+def test_failed_proofs_release_scratch(key_dir, temp_run_dir):
+    """A failing step removes its scratch dir; a failing chunk releases the chunks that were proved."""
+    from concurrent.futures import ThreadPoolExecutor
+    import prover.ezkl_runner as runner
+    prover = EzklProver(key_dir=key_dir, workers=1, witness_cache="")
+    scratch = os.path.join(temp_run_dir, "scratch")
+    os.makedirs(scratch)
+    with patch.object(runner, "SCRATCH_ROOT", scratch), \
+         patch.object(runner, "SCRATCH_MIN_FREE", 0), \
+         patch.object(prover, "_prove_in", side_effect=RuntimeError("prove failed")):
+        with pytest.raises(RuntimeError):
+            prover.prove_step(_payload(4))
+    assert os.listdir(scratch) == []
+
+    def fake_prove_step(payload):
+        if payload["chunk_idx"] == 1:
+            raise RuntimeError("chunk failed")
+        return f"chunk_{payload['chunk_idx']}.pf", {}
+
+    with patch.object(prover, "prove_step", side_effect=fake_prove_step), \
+         patch.object(prover, "release") as release:
+        with pytest.raises(RuntimeError, match="chunk failed"):
+            prover.prove_step_chunks(_payload(9), chunks=3)
+    release.assert_called_once_with(["chunk_0.pf"])
+
+    prover.workers = 3
+    with ThreadPoolExecutor(3) as pool, \
+         patch.object(prover, "_executor", return_value=pool), \
+         patch.object(runner, "_prove_one_chunk", side_effect=lambda p: fake_prove_step(p)[0]), \
+         patch.object(prover, "release") as release:
+        with pytest.raises(RuntimeError, match="chunk failed"):
+            prover.prove_step_chunks(_payload(9), chunks=3)
+    release.assert_called_once_with(["chunk_0.pf", "chunk_2.pf"])
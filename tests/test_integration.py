@@ -41,3 +41,53 @@ def test_mini_integration_run(temp_run_dir):
         first = json.loads(lines[0])
         assert first["step_idx"] == 0
         assert first["proof_hash"] == "00" * 32
+
+def test_verify_random_steps_reports_each_sample(temp_run_dir):
+    from unittest.mock import patch
+    from verifier import verify_steps
+    os.makedirs(os.path.join(temp_run_dir, "proofs"))
+    for i in range(6):
+        append_step(temp_run_dir, LoggedStep(step_idx=i, proof_hash=f"{i:02x}" * 32,
+                                             public_inputs={}, timestamp=0.0))
+        open(os.path.join(temp_run_dir, "proofs", f"step_{i:06d}.proof"), "wb").close()
+    checked = []
+    def fake_verify(pf, settings, vk, srs):
+        checked.append(os.path.basename(pf))
+        return not pf.endswith("step_000003.proof")
+
+    with patch.object(verify_steps, "verify_proof", side_effect=fake_verify):
+        results = verify_steps.verify_random_steps(temp_run_dir, k=6)
+        assert results == {i: i != 3 for i in range(6)}
+        assert sorted(checked) == [f"step_{i:06d}.proof" for i in range(6)]
+        assert len(verify_steps.verify_random_steps(temp_run_dir, k=1)) == 1
+
+def test_verify_random_steps_skips_missing_proofs(temp_run_dir, capsys):
+    from unittest.mock import patch
+    from verifier import verify_steps
+    os.makedirs(os.path.join(temp_run_dir, "proofs"))
+    for i in range(4):
+        append_step(temp_run_dir, LoggedStep(step_idx=i, proof_hash=f"{i:02x}" * 32,
+                                             public_inputs={}, timestamp=0.0))
+        if i != 2:
+            open(os.path.join(temp_run_dir, "proofs", f"step_{i:06d}.proof"), "wb").close()
+
+    with patch.object(verify_steps, "verify_proof", return_value=True) as verify:
+        results = verify_steps.verify_random_steps(temp_run_dir, k=4)
+    assert results == {0: True, 1: True, 2: False, 3: True}
+    assert verify.call_count == 3
+    assert capsys.readouterr().out.splitlines() == [
+        "step 0: OK", "step 1: OK", "step 2: MISSING", "step 3: OK"]
+
+def test_sample_steps_is_uniform(temp_run_dir):
+    """Reservoir sampling picks every step with probability k/n."""
+    import random
+    from collections import Counter
+    from verifier.verify_steps import _sample_steps
+    for i in range(10):
+        append_step(temp_run_dir, LoggedStep(step_idx=i, proof_hash=f"{i:02x}" * 32,
+                                             public_inputs={}, timestamp=0.0))
+    random.seed(0)
+    counts = Counter(s.step_idx for _ in range(2000) for s in _sample_steps(temp_run_dir, 3))
+    assert set(counts) == set(range(10))
+    assert all(abs(c / 2000 - 0.3) < 0.05 for c in counts.values())
+    assert len(_sample_steps(temp_run_dir, 20)) == 10
@@ -54,14 +54,16 @@ def test_prove_step_endpoint(client):
     
     response = c.post("/prove_step", json=payload)
     assert response.status_code == 200
-    data = response.json()
+    assert response.content == b"dummy_proof_bytes"
     
-    assert data["step_idx"] == 100
-    assert data["proof_hash"] is not None
-    assert data["public_inputs"] == [1, 2, 3]
+    import hashlib, json
+    assert response.headers["X-Step-Idx"] == "100"
+    assert response.headers["X-Proof-Hash"] == hashlib.sha256(b"dummy_proof_bytes").hexdigest()
+    assert json.loads(response.headers["X-Public-Inputs"]) == [1, 2, 3]
     
-    # Verify prover was called
+    # Verify prover was called and scratch files released after sending
     mock_prover.prove_step_chunks.assert_called_once()
+    mock_prover.release.assert_called_once_with(["/tmp/proof.pf"])
 
 def test_prove_step_aggregation(client):
     c, mock_prover = client
@@ -88,6 +90,164 @@ def test_prove_step_aggregation(client):
     
     response = c.post("/prove_step", json=payload)
     assert response.status_code == 200
+    assert response.content == b"aggregated_bytes"
+    assert response.headers["X-Chunks"] == "1"
     
     # Verify aggregation was called
     mock_prover.aggregate_chunk_proofs.assert_called_once()
+
+def test_prove_step_failure_releases_scratch(client):
+    """Scratch dirs are released even when aggregation fails and no response is sent."""
+    c, mock_prover = client
+    mock_prover.prove_step_chunks.return_value = (["/tmp/p1.pf", "/tmp/p2.pf"], [1, 2, 3])
+    mock_prover.aggregate_chunk_proofs.side_effect = RuntimeError("aggregation failed")
+    payload = {"w_flat": [0]*10, "g_flat": [0]*10, "m_flat": [0]*10, "v_flat": [0]*10,
+               "lr": 0.001, "beta1": 0.9, "beta2": 0.999, "eps": 1e-8, "t": 1, "step_idx": 102}
+
+    with pytest.raises(RuntimeError, match="aggregation failed"):
+        c.post("/prove_step", json=payload)
+    mock_prover.release.assert_called_once_with(["/tmp/p1.pf", "/tmp/p2.pf"])
+
+def test_warmup_endpoint(client):
+    c, mock_prover = client
+    mock_prover.warm = True
+
+    response = c.get("/warmup")
+    assert response.status_code == 200
+    assert response.json() == {"warm": True}
+    mock_prover.warmup.assert_called()
+
+def test_warmup_failure_is_logged_not_raised(client, caplog):
+    c, mock_prover = client
+    mock_prover.warm = False
+    mock_prover.warmup.side_effect = RuntimeError("input shape mismatch")
+
+    response = c.get("/warmup")
+    assert response.status_code == 200
+    assert response.json() == {"warm": False}
+    assert "warm-up failed" in caplog.text
+
+def test_prove_step_zstd_encoding(client):
+    c, mock_prover = client
+    with open("/tmp/proof.pf", "wb") as f:
+        f.write(b"dummy_proof_bytes")
+    payload = {
+        "w_flat": [0]*10, "g_flat": [0]*10, "m_flat": [0]*10, "v_flat": [0]*10,
+        "lr": 0.001, "beta1": 0.9, "beta2": 0.999, "eps": 1e-8, "t": 1, "step_idx": 7
+    }
+
+    # Without zstandard the proof is sent uncompressed whatever the client asks.
+    with patch("prover.service.zstd", None):
+        response = c.post("/prove_step", json=payload, headers={"Accept-Encoding": "zstd"})
+    assert "Content-Encoding" not in response.headers
+    assert response.content == b"dummy_proof_bytes"
+
+    fake_zstd = MagicMock()
+    fake_zstd.ZstdCompressor.return_value.compress.side_effect = lambda b: b"Z" + b
+    with patch("prover.service.zstd", fake_zstd):
+        plain = c.post("/prove_step", json=payload, headers={"Accept-Encoding": "gzip"})
+        packed = c.post("/prove_step", json=payload, headers={"Accept-Encoding": "gzip, zstd;q=1.0"})
+    assert "Content-Encoding" not in plain.headers
+    assert packed.headers["Content-Encoding"] == "zstd"
+    assert packed.headers["X-Proof-Hash"] == plain.headers["X-Proof-Hash"]
+    # The stub encoding is unknown to the test client, so the body is passed through.
+    assert packed.content == b"Zdummy_proof_bytes"
+    fake_zstd.ZstdCompressor.assert_called_with(level=3)
+
+def test_file_sha256(tmp_path):
+    import hashlib
+    from prover.service import _file_sha256
+    empty = tmp_path / "empty.pf"
+    empty.write_bytes(b"")
+    big = tmp_path / "big.pf"
+    big.write_bytes(os.urandom(3 << 20))
+    assert _file_sha256(str(empty)) == hashlib.sha256(b"").hexdigest()
+    assert _file_sha256(str(big)) == hashlib.sha256(big.read_bytes()).hexdigest()
+
+def test_prove_step_bin_matches_json(client):
+    import numpy as np
+    from zk_autograd.prover_client import STEP_META_HEADER, encode_step
+    c, mock_prover = client
+    with open("/tmp/proof.pf", "wb") as f:
+        f.write(b"dummy_proof_bytes")
+    payload = {
+        "w_flat": np.arange(10, dtype=np.int64), "g_flat": -np.arange(10, dtype=np.int64),
+        "m_flat": np.zeros(10, dtype=np.int64), "v_flat": np.full(10, 2**40, dtype=np.int64),
+        "lr": 0.001, "beta1": 0.9, "beta2": 0.999, "eps": 1e-8, "t": 1, "step_idx": 5
+    }
+    body, meta = encode_step(payload)
+    assert len(body) == 4 * 10 * 8
+    response = c.post("/prove_step_bin", content=body, headers={STEP_META_HEADER: meta})
+    assert response.status_code == 200
+    assert response.content == b"dummy_proof_bytes"
+    assert response.headers["X-Step-Idx"] == "5"
+    sent = mock_prover.prove_step_chunks.call_args[0][0]
+    for k in ("w_flat", "g_flat", "m_flat", "v_flat"):
+        np.testing.assert_array_equal(sent[k], payload[k])
+    assert sent["scale"] == 1000 and sent["circuit"] == "adam"
+
+    # Ragged bodies and missing fields are rejected before proving.
+    assert c.post("/prove_step_bin", content=body[:-8], headers={STEP_META_HEADER: meta}).status_code == 422
+    assert c.post("/prove_step_bin", content=body).status_code == 422
+
+def test_prove_step_bin_int32_and_zstd_bodies(client):
+    import json
+    import numpy as np
+    from zk_autograd.prover_client import STEP_META_HEADER, encode_step
+    c, mock_prover = client
+    with open("/tmp/proof.pf", "wb") as f:
+        f.write(b"dummy_proof_bytes")
+    payload = {
+        "w_flat": np.arange(-5, 5, dtype=np.int64), "g_flat": np.full(10, 2**31 - 1, dtype=np.int64),
+        "m_flat": np.full(10, -2**31, dtype=np.int64), "v_flat": np.zeros(10, dtype=np.int64),
+        "lr": 0.001, "beta1": 0.9, "beta2": 0.999, "eps": 1e-8, "t": 1, "step_idx": 6
+    }
+    body, meta = encode_step(payload)
+    assert json.loads(meta)["dtype"] == "<i4"
+    assert len(body) == 4 * 10 * 4
+
+    fake_zstd = MagicMock()
+    fake_zstd.ZstdError = type("ZstdError", (Exception,), {})
+    fake_zstd.ZstdDecompressor.return_value.decompress.side_effect = lambda b, max_output_size: b[1:]
+    headers = {STEP_META_HEADER: meta, "Content-Encoding": "zstd"}
+    with patch("prover.service.zstd", None):
+        assert c.post("/prove_step_bin", content=b"Z" + body, headers=headers).status_code == 415
+    with patch("prover.service.zstd", fake_zstd):
+        response = c.post("/prove_step_bin", content=b"Z" + body, headers=headers)
+    assert response.status_code == 200
+    assert fake_zstd.ZstdDecompressor.return_value.decompress.call_args.kwargs["max_output_size"] == 4 * 8 * (1 << 22)
+    sent = mock_prover.prove_step_chunks.call_args[0][0]
+    for k in ("w_flat", "g_flat", "m_flat", "v_flat"):
+        np.testing.assert_array_equal(sent[k], payload[k])
+
+    # Malformed or oversized frames are client errors, and the cap is configurable.
+    fake_zstd.ZstdDecompressor.return_value.decompress.side_effect = fake_zstd.ZstdError("exceeds max_output_size")
+    with patch("prover.service.zstd", fake_zstd):
+        assert c.post("/prove_step_bin", content=b"Z" + body, headers=headers).status_code == 400
+    with patch.dict(os.environ, {"PROVE_MAX_PARAMS": "4"}):
+        assert c.post("/prove_step_bin", content=body, headers={STEP_META_HEADER: meta}).status_code == 413
+
+    bad = json.dumps(dict(json.loads(meta), dtype="<f8"))
+    assert c.post("/prove_step_bin", content=body, headers={STEP_META_HEADER: bad}).status_code == 422
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_body_serializes_arrays(client, use_orjson):
+    import json
+    import numpy as np
+    from zk_autograd import prover_client
+    if use_orjson and prover_client.orjson is None:
+        pytest.skip("orjson not installed")
+    c, mock_prover = client
+    with open("/tmp/proof.pf", "wb") as f:
+        f.write(b"dummy_proof_bytes")
+    payload = {
+        "w_flat": np.arange(10, dtype=np.int64), "g_flat": np.arange(10, dtype=np.int32),
+        "m_flat": [0]*10, "v_flat": np.zeros(10, dtype=np.int64),
+        "lr": 0.001, "beta1": 0.9, "beta2": 0.999, "eps": 1e-8, "t": 1, "step_idx": 3
+    }
+    with patch.object(prover_client, "orjson", prover_client.orjson if use_orjson else None):
+        body = prover_client.json_body(payload)
+    assert json.loads(body)["w_flat"] == list(range(10))
+    response = c.post("/prove_step", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 200
+    assert mock_prover.prove_step_chunks.call_args[0][0]["g_flat"] == list(range(10))
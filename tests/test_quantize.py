@@ -0,0 +1,51 @@
+"""test_quantize.py
+
+Unit tests for fixed-point quantization helpers.
+"""
+import numpy as np
+import pytest
+import torch
+from zk_autograd import quantize
+from zk_autograd.quantize import flatten_params, quantize_tensor, stack_params, to_field_ints
+
+def test_flatten_params_matches_per_tensor_quantization():
+    """Verifies the batched path equals quantizing each tensor in key order."""
+    torch.manual_seed(0)
+    d = {"b": torch.randn(3, 4), "a": torch.randn(5), "c": torch.tensor([0.0005, -0.0015, 2.5e-3])}
+    expected = np.concatenate([np.round(d[k].numpy().reshape(-1) * 1000).astype(np.int64) for k in sorted(d)])
+    out = flatten_params(d, 1000)
+    assert out.dtype == np.int64
+    np.testing.assert_array_equal(out, expected)
+
+def test_flatten_params_with_precomputed_order():
+    d = {"b": torch.tensor([1.0, 2.0]), "a": torch.tensor([3.0])}
+    np.testing.assert_array_equal(flatten_params(d, 10, order=["a", "b"]), flatten_params(d, 10))
+    np.testing.assert_array_equal(flatten_params(d, 10, order=["b", "a"]), np.array([10, 20, 30]))
+
+def test_stack_params_matches_flatten_params():
+    torch.manual_seed(0)
+    ds = [{"b": torch.randn(2, 3), "a": torch.randn(4)} for _ in range(4)]
+    out = stack_params(ds, 1000)
+    assert out.shape == (4, 10) and out.flags["C_CONTIGUOUS"]
+    for row, d in zip(out, ds):
+        np.testing.assert_array_equal(row, flatten_params(d, 1000))
+
+def test_quantize_tensor_rounds_half_to_even():
+    q = quantize_tensor(torch.tensor([0.5, 1.5, -0.5, -2.5]), 1)
+    np.testing.assert_array_equal(q, np.array([0, 2, 0, -2], dtype=np.int64))
+
+def test_to_field_ints_wraps_negatives():
+    prime = 2**61 - 1
+    q = np.array([-1, 0, 5, prime + 3], dtype=np.int64)
+    np.testing.assert_array_equal(to_field_ints(q), np.array([prime - 1, 0, 5, 3], dtype=np.int64))
+
+def test_to_field_ints_mersenne_kernel_matches_mod():
+    if quantize.numba is None:
+        pytest.skip("numba not installed")
+    prime = 2**61 - 1
+    rng = np.random.default_rng(0)
+    q = rng.integers(-2**63, 2**63 - 1, size=quantize.FIELD_NATIVE_MIN, dtype=np.int64)
+    q[:6] = [-1, 0, prime, prime + 3, -prime, -2**63]
+    np.testing.assert_array_equal(to_field_ints(q), np.mod(q, prime))
+    # Other moduli take the generic path.
+    np.testing.assert_array_equal(to_field_ints(q, prime=97), np.mod(q, 97))
@@ -5,79 +5,207 @@ Unit tests for the proof splitting and aggregation logic.
 import os
 import json
 import shutil
-import tempfile
+import hashlib
+import inspect
+from types import SimpleNamespace
+import pytest
 from unittest.mock import patch, MagicMock
-from zk_autograd.splitting import plan_split, aggregate_proofs
+from zk_autograd import audit_log, splitting
+from zk_autograd.splitting import plan_split, aggregate_proofs, _proof_leaf
 
-def test_plan_split_defaults():
+def test_plan_split_defaults(temp_run_dir):
     """Test plan_split with default arguments (no EZKL)."""
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        # Mock shutil.which to return None (simulate no ezkl)
-        with patch("shutil.which", return_value=None):
-            plan = plan_split("model.onnx", chunks=4, out_dir=tmp_dir)
+    # Mock shutil.which to return None (simulate no ezkl)
+    with patch("shutil.which", return_value=None):
+        plan = plan_split("model.onnx", chunks=4, out_dir=temp_run_dir)
+    
+    assert plan["model"] == "model.onnx"
+    assert plan["chunks"] == 4
+    assert plan["strategy"] == "logical-block"
+    
+    # Check if plan file was written
+    plan_path = os.path.join(temp_run_dir, "split_plan.json")
+    assert os.path.exists(plan_path)
+    with open(plan_path, "rb") as f:
+        saved_plan = json.loads(f.read())
+    assert saved_plan == plan
+
+def test_plan_split_with_ezkl(temp_run_dir):
+    """Test plan_split when EZKL is available."""
+    with patch("shutil.which", return_value="/usr/bin/ezkl"), \
+         patch("subprocess.check_call") as mock_call:
         
-        assert plan["model"] == "model.onnx"
-        assert plan["chunks"] == 4
-        assert plan["strategy"] == "logical-block"
+        plan = plan_split("model.onnx", chunks=2, out_dir=temp_run_dir)
         
-        # Check if plan file was written
-        plan_path = os.path.join(tmp_dir, "split_plan.json")
-        assert os.path.exists(plan_path)
-        with open(plan_path, "r") as f:
-            saved_plan = json.load(f)
-        assert saved_plan == plan
-
-def test_plan_split_with_ezkl():
-    """Test plan_split when EZKL is available."""
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        with patch("shutil.which", return_value="/usr/bin/ezkl"), \
-             patch("subprocess.check_call") as mock_call:
-            
-            plan = plan_split("model.onnx", chunks=2, out_dir=tmp_dir)
-            
-            assert plan["strategy"] == "ezkl-split-model"
-            mock_call.assert_called_once()
-            args = mock_call.call_args[0][0]
-            assert args[0] == "ezkl"
-            assert args[1] == "split-model"
-
-def test_aggregate_proofs_fallback():
+        assert plan["strategy"] == "ezkl-split-model"
+        mock_call.assert_called_once()
+        args = mock_call.call_args[0][0]
+        assert args[0] == "ezkl"
+        assert args[1] == "split-model"
+
+def test_aggregate_proofs_fallback(temp_run_dir):
     """Test aggregate_proofs fallback logic (hashing)."""
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        # Create dummy partial proofs
-        p1 = os.path.join(tmp_dir, "p1.pf")
-        p2 = os.path.join(tmp_dir, "p2.pf")
-        with open(p1, "wb") as f: f.write(b"proof1")
-        with open(p2, "wb") as f: f.write(b"proof2")
-        
-        out_path = os.path.join(tmp_dir, "agg.pf")
+    # Create dummy partial proofs
+    p1 = os.path.join(temp_run_dir, "p1.pf")
+    p2 = os.path.join(temp_run_dir, "p2.pf")
+    with open(p1, "wb") as f: f.write(b"proof1")
+    with open(p2, "wb") as f: f.write(b"proof2")
+    
+    out_path = os.path.join(temp_run_dir, "agg.pf")
+    
+    with patch("shutil.which", return_value=None):
+        res = aggregate_proofs([p1, p2], out_path)
         
-        with patch("shutil.which", return_value=None):
-            res = aggregate_proofs([p1, p2], out_path)
-            
-        assert res == out_path
-        assert os.path.exists(out_path)
-        # Verify content is hash of inputs
-        import hashlib
-        h = hashlib.sha256()
-        h.update(b"proof1")
-        h.update(b"proof2")
-        expected = h.hexdigest().encode()
-        with open(out_path, "rb") as f:
-            assert f.read() == expected
-
-def test_aggregate_proofs_ezkl():
+    assert res == out_path
+    assert os.path.exists(out_path)
+    # Verify content is the Merkle root of the per-proof hashes
+    leaf1 = hashlib.sha256(b"proof1").digest()
+    leaf2 = hashlib.sha256(b"proof2").digest()
+    expected = hashlib.sha256(leaf1 + leaf2).hexdigest().encode()
+    with open(out_path, "rb") as f:
+        assert f.read() == expected
+
+def test_aggregate_proofs_ezkl(temp_run_dir):
     """Test aggregate_proofs calling EZKL."""
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        p1 = os.path.join(tmp_dir, "p1.pf")
-        out_path = os.path.join(tmp_dir, "agg.pf")
+    p1 = os.path.join(temp_run_dir, "p1.pf")
+    out_path = os.path.join(temp_run_dir, "agg.pf")
+    
+    with patch("shutil.which", return_value="/usr/bin/ezkl"), \
+         patch("subprocess.check_call") as mock_call:
+        
+        aggregate_proofs([p1], out_path)
         
-        with patch("shutil.which", return_value="/usr/bin/ezkl"), \
-             patch("subprocess.check_call") as mock_call:
-            
-            aggregate_proofs([p1], out_path)
-            
-            mock_call.assert_called_once()
-            cmd = mock_call.call_args[0][0]
-            assert cmd[0] == "ezkl"
-            assert cmd[1] == "aggregate"
+        mock_call.assert_called_once()
+        cmd = mock_call.call_args[0][0]
+        assert cmd[0] == "ezkl"
+        assert cmd[1] == "aggregate"
+
+def test_aggregate_proofs_fallback_odd_and_empty_proofs(temp_run_dir):
+    """An odd layer duplicates its last node; empty proofs hash as sha256(b"")."""
+    blobs = [os.urandom((4 << 20) + 1), b"", os.urandom(100)]
+    paths = []
+    for i, b in enumerate(blobs):
+        paths.append(os.path.join(temp_run_dir, f"p{i}.pf"))
+        with open(paths[-1], "wb") as f:
+            f.write(b)
+    out_path = os.path.join(temp_run_dir, "agg.pf")
+    with patch("shutil.which", return_value=None):
+        aggregate_proofs(paths, out_path)
+    node = lambda b: hashlib.sha256(b).digest()
+    l0, l1, l2 = (node(b) for b in blobs)
+    with open(out_path, "rb") as f:
+        assert f.read() == node(node(l0 + l1) + node(l2 + l2)).hex().encode()
+    with patch("shutil.which", return_value=None):
+        aggregate_proofs(paths[2:], out_path)
+    with open(out_path, "rb") as f:
+        assert f.read() == l2.hex().encode()
+
+def test_proof_leaf_without_file_digest(temp_run_dir, monkeypatch):
+    """Unmappable files still hash correctly on Pythons without file_digest."""
+    p = os.path.join(temp_run_dir, "empty.pf")
+    open(p, "wb").close()
+    assert _proof_leaf(p) == hashlib.sha256(b"").hexdigest()
+    monkeypatch.delattr(hashlib, "file_digest", raising=False)
+    assert _proof_leaf(p) == hashlib.sha256(b"").hexdigest()
+
+class _Blake2sStandIn:
+    """Stands in for blake3.blake3 (hashing with BLAKE2s) so the tree shape is checked without the package."""
+    AUTO = -1
+
+    def __init__(self, data=b"", max_threads=1):
+        self._h = hashlib.blake2s(data)
+
+    def update_mmap(self, path):
+        with open(path, "rb") as f:
+            self._h.update(f.read())
+
+    def digest(self):
+        return self._h.digest()
+
+    def hexdigest(self):
+        return self._h.hexdigest()
+
+def test_aggregate_proofs_fallback_blake3(temp_run_dir):
+    """tree_hash="blake3" hashes leaves and nodes with BLAKE3."""
+    blobs = [b"proof1", b"proof2", b""]
+    paths = []
+    for i, b in enumerate(blobs):
+        paths.append(os.path.join(temp_run_dir, f"p{i}.pf"))
+        with open(paths[-1], "wb") as f:
+            f.write(b)
+    out_path = os.path.join(temp_run_dir, "agg.pf")
+    stand_in = SimpleNamespace(blake3=_Blake2sStandIn)
+    with patch("shutil.which", return_value=None), \
+         patch.object(splitting, "blake3", stand_in), patch.object(audit_log, "blake3", stand_in):
+        aggregate_proofs(paths, out_path, tree_hash="blake3")
+    node = lambda b: hashlib.blake2s(b).digest()
+    l0, l1, l2 = (node(b) for b in blobs)
+    with open(out_path, "rb") as f:
+        assert f.read() == node(node(l0 + l1) + node(l2 + l2)).hex().encode()
+
+    with patch("shutil.which", return_value=None), patch.object(splitting, "blake3", None):
+        with pytest.raises(RuntimeError, match="blake3"):
+            aggregate_proofs(paths, out_path, tree_hash="blake3")
+    with pytest.raises(ValueError, match="unknown tree_hash"):
+        aggregate_proofs(paths, out_path, tree_hash="md5")
+
+def test_aggregate_proofs_fallback_hashes_each_file_once(temp_run_dir):
+    """Repeated paths and hard links are hashed once but still fill their leaf slots."""
+    p1 = os.path.join(temp_run_dir, "p1.pf")
+    p2 = os.path.join(temp_run_dir, "p2.pf")
+    with open(p1, "wb") as f: f.write(b"proof1")
+    with open(p2, "wb") as f: f.write(b"proof1")
+    link = os.path.join(temp_run_dir, "p1_link.pf")
+    os.link(p1, link)
+    out_path = os.path.join(temp_run_dir, "agg.pf")
+    with patch("shutil.which", return_value=None), \
+         patch.object(splitting, "_proof_leaf", wraps=splitting._proof_leaf) as leaf:
+        aggregate_proofs([p1, p2, p1, link], out_path)
+    assert sorted(c.args[0] for c in leaf.call_args_list) == sorted([link, p2])
+    node = lambda b: hashlib.sha256(b).digest()
+    l = node(b"proof1")
+    with open(out_path, "rb") as f:
+        assert f.read() == node(node(l + l) + node(l + l)).hex().encode()
+
+def test_aggregate_proofs_uses_python_bindings(temp_run_dir):
+    """With keys and an ezkl.aggregate binding, no ezkl process is forked."""
+    out_path = os.path.join(temp_run_dir, "agg.pf")
+    binding = MagicMock()
+    with patch.object(splitting, "_ezkl_py", binding), \
+         patch("shutil.which", return_value="/usr/bin/ezkl"), \
+         patch("subprocess.check_call") as mock_call:
+        res = aggregate_proofs(["p1", "p2"], out_path, vk_path="vk.key", srs_path="kzg.srs")
+        assert res == out_path
+        binding.aggregate.assert_called_once_with(proof_paths=["p1", "p2"], vk_path="vk.key",
+                                                  srs_path="kzg.srs", output_path=out_path)
+        mock_call.assert_not_called()
+
+        # Without keys the CLI is used, as before.
+        aggregate_proofs(["p1"], out_path)
+        mock_call.assert_called_once()
+
+def test_aggregate_proofs_binding_errors_propagate(temp_run_dir, caplog):
+    """Aggregation failures raise; only a signature mismatch falls back (and is logged)."""
+    out_path = os.path.join(temp_run_dir, "agg.pf")
+    binding = MagicMock()
+    binding.aggregate.side_effect = RuntimeError("invalid vk")
+    with patch.object(splitting, "_ezkl_py", binding), patch("shutil.which", return_value=None):
+        with pytest.raises(RuntimeError, match="invalid vk"):
+            aggregate_proofs(["p1"], out_path, vk_path="vk.key", srs_path="kzg.srs")
+
+    p1 = os.path.join(temp_run_dir, "p1.pf")
+    with open(p1, "wb") as f: f.write(b"proof1")
+    binding.aggregate.side_effect = TypeError("unexpected keyword argument 'proof_paths'")
+    with patch.object(splitting, "_ezkl_py", binding), patch("shutil.which", return_value=None):
+        aggregate_proofs([p1], out_path, vk_path="vk.key", srs_path="kzg.srs")
+    with open(out_path, "rb") as f:
+        assert f.read() == hashlib.sha256(b"proof1").hexdigest().encode()
+    assert "signature not supported" in caplog.text
+
+def test_aggregate_proofs_matches_real_binding_signature():
+    """The keyword call in aggregate_proofs binds against the installed ezkl.aggregate."""
+    ezkl = pytest.importorskip("ezkl")
+    if not hasattr(ezkl, "aggregate"):
+        pytest.skip(f"ezkl {getattr(ezkl, '__version__', '?')} has no aggregate binding")
+    inspect.signature(ezkl.aggregate).bind(proof_paths=["p1"], vk_path="vk.key",
+                                           srs_path="kzg.srs", output_path="agg.pf")
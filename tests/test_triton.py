@@ -5,37 +5,117 @@ Unit tests for Triton kernel availability checks and fallback logic.
 import pytest
 import torch
 from unittest.mock import patch, MagicMock
-import sys
+from zk_autograd import triton_kernels as tk
 
-# We need to mock the triton import if it's not installed to test the 'available' logic
-# But since the module imports it at top level, we might need to reload or patch sys.modules
+# triton is imported at module level, so tests patch the module attributes
+# (tk.triton, tk.adam_step_kernel) directly instead of re-importing.
+
+@pytest.fixture(autouse=True)
+def _reset_available_cache():
+    """available() is memoized; start and end every test with an empty cache.
+
+    This is the only state the tests share: the patches are undone on exit,
+    and xdist workers are separate processes, so the file is safe under -n.
+    """
+    tk.available.cache_clear()
+    yield
+    tk.available.cache_clear()
 
 def test_triton_not_available_if_module_missing():
     """Test available() returns False if triton module is missing."""
-    # We simulate this by patching the module level variable in zk_autograd.triton_kernels
-    # Since we can't easily unload the module if it's already imported, we'll patch the variable
-    
-    with patch("zk_autograd.triton_kernels.triton", None):
-        from zk_autograd.triton_kernels import available, fused_adam_step
-        assert available() is False
+    with patch.object(tk, "triton", None):
+        tk.available.cache_clear()
+        assert tk.available() is False
         
         # Should raise assertion error if we try to run it
         with pytest.raises(AssertionError, match="Triton/CUDA not available"):
-            fused_adam_step(None, None, None, None, 0, 0, 0, 0, 0)
+            tk.fused_adam_step(None, None, None, None, 0, 0, 0, 0, 0)
 
 def test_triton_not_available_if_no_cuda():
     """Test available() returns False if CUDA is missing (even if triton exists)."""
     # Mock triton existing but cuda missing
-    with patch("zk_autograd.triton_kernels.triton", MagicMock()), \
+    with patch.object(tk, "triton", MagicMock()), \
          patch("torch.cuda.is_available", return_value=False):
-        
-        from zk_autograd.triton_kernels import available
-        assert available() is False
+        tk.available.cache_clear()
+        assert tk.available() is False
 
 def test_triton_available():
     """Test available() returns True if both exist."""
-    with patch("zk_autograd.triton_kernels.triton", MagicMock()), \
+    with patch.object(tk, "triton", MagicMock()), \
          patch("torch.cuda.is_available", return_value=True):
-        
-        from zk_autograd.triton_kernels import available
-        assert available() is True
+        tk.available.cache_clear()
+        assert tk.available() is True
+
+def test_fused_adam_step_launches_unpadded():
+    """The tail block is masked in-kernel, so inputs are passed through unpadded."""
+    fake_triton = MagicMock()
+    fake_triton.cdiv.side_effect = lambda a, b: (a + b - 1) // b
+    kernel = MagicMock()
+    with patch.object(tk, "triton", fake_triton), \
+         patch.object(tk, "adam_step_kernel", kernel, create=True), \
+         patch("torch.cuda.is_available", return_value=True):
+        tk.available.cache_clear()
+        w, g, m, v = (torch.randn(1500) for _ in range(4))
+        w_out, m_out, v_out = tk.fused_adam_step(w, g, m, v, 1e-3, 0.9, 0.999, 1e-8, 1)
+
+    kernel.__getitem__.assert_called_once_with((2,))
+    args, kwargs = kernel.__getitem__.return_value.call_args
+    assert all(a.data_ptr() == b.data_ptr() for a, b in zip(args[:4], (w, g, m, v)))
+    assert kwargs == {"N": 1500, "BLOCK": 1024, "num_warps": 4}
+    assert args[-2:] == pytest.approx((1 / (1 - 0.9), 1 / (1 - 0.999)))
+    assert w_out.shape == m_out.shape == v_out.shape == (1500,)
+
+def test_available_is_cached():
+    """CUDA is probed once; later calls reuse the cached answer."""
+    with patch.object(tk, "triton", MagicMock()), \
+         patch("torch.cuda.is_available", return_value=True) as probe:
+        tk.available.cache_clear()
+        assert tk.available() is True
+        assert tk.available() is True
+        assert probe.call_count == 1
+
+def test_fused_adam_step_flattens_and_passes_adamw_terms():
+    """Multi-dim tensors launch as one flat range; wd and clip reach the kernel."""
+    fake_triton = MagicMock()
+    fake_triton.cdiv.side_effect = lambda a, b: (a + b - 1) // b
+    kernel = MagicMock()
+    with patch.object(tk, "triton", fake_triton), \
+         patch.object(tk, "adam_step_kernel", kernel, create=True), \
+         patch("torch.cuda.is_available", return_value=True):
+        tk.available.cache_clear()
+        w, g, m, v = (torch.randn(16, 8) for _ in range(4))
+        w_out, m_out, v_out = tk.fused_adam_step(w, g, m, v, 1e-3, 0.9, 0.999, 1e-8, 3,
+                                                 wd=0.01, clip_coef=0.5)
+
+    args, kwargs = kernel.__getitem__.return_value.call_args
+    assert all(a.shape == (128,) for a in args[:7])
+    assert args[11:13] == (0.01, 0.5)
+    assert kwargs["N"] == 128
+    assert w_out.shape == m_out.shape == v_out.shape == (16, 8)
+
+def test_graphed_adam_captures_once_and_replays():
+    """Capture warms up then records one launch; step refreshes lr/bias corrections and replays."""
+    fake_triton = MagicMock()
+    fake_triton.cdiv.side_effect = lambda a, b: (a + b - 1) // b
+    kernel = MagicMock()
+    graph = MagicMock()
+    with patch.object(tk, "triton", fake_triton), \
+         patch.object(tk, "adam_step_graph_kernel", kernel, create=True), \
+         patch("torch.cuda.is_available", return_value=True), \
+         patch("torch.cuda.synchronize"), \
+         patch("torch.cuda.CUDAGraph", return_value=graph), \
+         patch("torch.cuda.graph") as capture_ctx:
+        tk.available.cache_clear()
+        w, g, m, v = (torch.randn(1500) for _ in range(4))
+        opt = tk.GraphedAdam(0.9, 0.999, 1e-8)
+        opt.capture(w, g, m, v, lr=1e-3)
+        capture_ctx.assert_called_once_with(graph)
+        assert kernel.__getitem__.return_value.call_count == 2
+        args, kwargs = kernel.__getitem__.return_value.call_args
+        assert all(a is b for a, b in zip(args[:4], (w, g, m, v)))
+        assert kwargs == {"N": 1500, "BLOCK": 1024, "num_warps": 4}
+
+        opt.step(lr=5e-4, t=2)
+    graph.replay.assert_called_once_with()
+    assert kernel.__getitem__.return_value.call_count == 2
+    assert opt.S.tolist() == pytest.approx([5e-4, 1 / (1 - 0.9 ** 2), 1 / (1 - 0.999 ** 2)], rel=1e-6)
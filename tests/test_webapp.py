@@ -5,6 +5,12 @@ Tests for the web application assets and data structures.
 import os
 import json
 import pytest
+from pydantic import ValidationError
+from zk_autograd.runs_index import RunEntry, append_run, build_runs_json, decode_runs, iter_runs
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 WEBAPP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../webapp"))
 
@@ -37,15 +43,39 @@ def test_runs_json_schema(temp_run_dir):
     
     # Write it
     runs_path = os.path.join(temp_run_dir, "runs.json")
-    with open(runs_path, "w") as f:
-        json.dump(dummy_runs, f)
-        
+    with open(runs_path, "wb") as f:
+        f.write(orjson.dumps(dummy_runs) if orjson is not None else json.dumps(dummy_runs).encode())
+
     # Read it back and validate
-    with open(runs_path) as f:
-        data = json.load(f)
-        assert isinstance(data, list)
-        assert len(data) == 1
-        item = data[0]
-        assert "name" in item
-        assert "merkle_root" in item
-        assert "magnet" in item
+    with open(runs_path, "rb") as f:
+        runs = decode_runs(f.read())
+    assert runs == [RunEntry(**dummy_runs[0])]
+
+def test_runs_ndjson_append_and_compat_view(temp_run_dir):
+    """Runs are appended row by row; runs.index points at each row; runs.json mirrors the rows."""
+    entries = [RunEntry(name=f"run-{i}", merkle_root="ab" * 32, num_steps=i,
+                        torrent_file=f"torrents/run-{i}.toy.torrent.json", magnet="magnet:?...")
+               for i in range(3)]
+    offsets = [append_run(temp_run_dir, e) for e in entries]
+
+    with open(os.path.join(temp_run_dir, "runs.ndjson"), "rb") as f:
+        for line, e in zip(f, entries):
+            assert RunEntry.model_validate_json(line) == e
+    with open(os.path.join(temp_run_dir, "runs.index"), "rb") as f:
+        index = f.read()
+    assert [int.from_bytes(index[i:i+8], "little") for i in range(0, len(index), 8)] == offsets
+    assert list(iter_runs(temp_run_dir, offsets[1])) == entries[1:]
+
+    with open(build_runs_json(temp_run_dir), "rb") as f:
+        assert decode_runs(f.read()) == entries
+    append_run(temp_run_dir, entries[0])
+    with open(build_runs_json(temp_run_dir), "rb") as f:
+        assert decode_runs(f.read()) == entries + entries[:1]
+
+def test_runs_json_schema_rejects_malformed_rows():
+    """Rows missing a field or with the wrong type fail validation."""
+    with pytest.raises(ValidationError):
+        decode_runs(b'[{"name": "run-1", "merkle_root": "abc", "num_steps": 10}]')
+    with pytest.raises(ValidationError):
+        decode_runs(b'[{"name": "run-1", "merkle_root": "abc", "num_steps": "ten",'
+                    b' "torrent_file": "t", "magnet": "m"}]')
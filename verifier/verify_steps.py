@@ -3,31 +3,70 @@
 Utility to verify random steps from a training run audit log.
 """
 import argparse, random, os
-from zk_autograd.audit_log import load_log
+from concurrent.futures import ThreadPoolExecutor
+from zk_autograd.audit_log import iter_log
 from prover.ezkl_runner import verify_proof
 
+def _sample_steps(run_dir: str, k: int):
+    """Reservoir-samples up to k steps from the log (Algorithm R)."""
+    reservoir = []
+    for i, step in enumerate(iter_log(run_dir)):
+        if i < k:
+            reservoir.append(step)
+        else:
+            j = random.randrange(i + 1)
+            if j < k:
+                reservoir[j] = step
+    return reservoir
+
 def verify_random_steps(run_dir: str, k: int = 5, key_dir="prover/keys"):
     """Verifies a random sample of proofs from a run.
 
+    Steps are drawn uniformly in one streaming pass over the log, so only
+    the k sampled steps are held in memory. The sampled proofs are verified
+    concurrently on a thread pool; results are printed in step order.
+    Proofs missing from the proofs directory are reported as MISSING
+    without invoking the verifier.
+
     Args:
         run_dir: The directory of the training run.
         k: The number of steps to verify.
         key_dir: The directory containing EZKL keys and settings.
+
+    Returns:
+        A dictionary mapping each sampled step index to its verification
+        result (False for missing proofs).
     """
-    log = load_log(run_dir)
-    if not log.steps:
+    steps = sorted(_sample_steps(run_dir, k), key=lambda s: s.step_idx)
+    if not steps:
         print("No steps in log.")
-        return
-    steps = random.sample(log.steps, min(k, len(log.steps)))
+        return {}
     proofs_dir = os.path.join(run_dir, "proofs")
     settings = os.path.join(key_dir, "settings.json")
     vk = os.path.join(key_dir, "vk.key")
     srs = os.path.join(key_dir, "kzg.srs")
 
-    for s in steps:
-        pf = os.path.join(proofs_dir, f"step_{s.step_idx:06d}.proof")
-        ok = verify_proof(pf, settings, vk, srs)
-        print(f"step {s.step_idx}: {'OK' if ok else 'FAIL'}")
+    try:
+        with os.scandir(proofs_dir) as it:
+            present = {e.name for e in it}
+    except FileNotFoundError:
+        present = set()
+    # Proof names and paths are built once, up front, for the whole sample.
+    entries = [(s.step_idx, f"step_{s.step_idx:06d}.proof") for s in steps]
+    found = [(idx, os.path.join(proofs_dir, name)) for idx, name in entries if name in present]
+    verify = lambda item: verify_proof(item[1], settings, vk, srs)
+    if len(found) <= 1:
+        oks = [verify(item) for item in found]
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(found), os.cpu_count() or 1)) as ex:
+            oks = list(ex.map(verify, found))
+    verified = {idx: ok for (idx, _), ok in zip(found, oks)}
+    results = {}
+    for idx, _ in entries:
+        ok = verified.get(idx)
+        print(f"step {idx}: {'MISSING' if ok is None else 'OK' if ok else 'FAIL'}")
+        results[idx] = False if ok is None else ok
+    return results
 
 def cli():
     """Command-line interface for verifying random steps."""